@@ -7,14 +7,28 @@ VERSION: Standalone (No Vultr/Qdrant Required)
 import os
 from dotenv import load_dotenv
 import json
+import pickle
+import re
 import asyncio
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+import hashlib
+import heapq
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, FrozenSet, Iterator, List, Optional, Sequence, Set, Tuple, Union
+from dataclasses import dataclass, field
 from datetime import datetime
 
 import httpx
 from fastapi import FastAPI, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
 import random
 import math
@@ -28,10 +42,18 @@ load_dotenv()
 
 CEREBRAS_API_KEY = os.getenv("CEREBRAS_API_KEY", "your_cerebras_api_key_here")
 CEREBRAS_API_URL = "https://api.cerebras.ai/v1/chat/completions"
+CEREBRAS_MODEL = "llama-3.3-70b"
 
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY", "your_elevenlabs_api_key_here")
 ELEVENLABS_API_URL = "https://api.elevenlabs.io/v1/text-to-speech"
 ELEVENLABS_VOICE_ID = "21m00Tcm4TlvDq8ikWAM"  # Default voice ID (Rachel)
+ELEVENLABS_MODEL_ID = "eleven_multilingual_v2"
+ELEVENLABS_VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.75,
+    "style": 0.0,
+    "use_speaker_boost": True
+}
 
 def _has_real_key(value: str, placeholder: str) -> bool:
     """Quick helper to detect whether a secret env var is still using its placeholder."""
@@ -44,102 +66,112 @@ def _has_real_key(value: str, placeholder: str) -> bool:
 HAS_CEREBRAS_KEY = _has_real_key(CEREBRAS_API_KEY, "your_cerebras_api_key_here")
 HAS_ELEVENLABS_KEY = _has_real_key(ELEVENLABS_API_KEY, "your_elevenlabs_api_key_here")
 
-# ============================================================================
-# IN-MEMORY PROTOCOL DATABASE (Replaces Qdrant)
-# ============================================================================
-MEDICAL_PROTOCOLS_DB = {
-    "chest_pain": {
-        "protocol": "Cardiac Emergency Protocol",
-        "details": "Administer aspirin 324mg (chewable), establish IV access, obtain 12-lead ECG, consider nitroglycerin 0.4mg SL if systolic BP >100mmHg. Monitor for changes in vital signs.",
-        "contraindications": ["Allergy to aspirin", "Active bleeding", "Hypotension (SBP <90mmHg)", "Recent use of PDE5 inhibitors"],
-        "keywords": ["chest pain", "cardiac", "heart attack", "mi", "myocardial infarction", "angina"],
-        "score": 0.95
-    },
-    "difficulty_breathing": {
-        "protocol": "Respiratory Distress Protocol",
-        "details": "Assess airway patency, administer oxygen via nasal cannula or non-rebreather to maintain SpO2 >94%. Consider albuterol 2.5mg nebulizer for bronchospasm. Position patient upright if tolerated.",
-        "contraindications": ["Tension pneumothorax without decompression", "Severe hypotension"],
-        "keywords": ["difficulty breathing", "dyspnea", "shortness of breath", "respiratory distress", "wheezing", "asthma", "copd"],
-        "score": 0.93
-    },
-    "altered_mental_status": {
-        "protocol": "Neurological Emergency Protocol",
-        "details": "Check blood glucose immediately. Assess using AVPU or GCS. Perform FAST exam for stroke. Protect airway, administer oxygen. Consider dextrose if hypoglycemic (<60mg/dL). Monitor vitals continuously.",
-        "contraindications": ["None for initial assessment"],
-        "keywords": ["altered mental status", "confusion", "unresponsive", "stroke", "seizure", "syncope", "unconscious"],
-        "score": 0.91
-    },
-    "severe_bleeding": {
-        "protocol": "Hemorrhage Control Protocol",
-        "details": "Apply direct pressure to wound. Use tourniquet for extremity hemorrhage if direct pressure fails. Establish large-bore IV access x2. Administer normal saline or LR for fluid resuscitation. Monitor for shock.",
-        "contraindications": ["Do not remove impaled objects"],
-        "keywords": ["bleeding", "hemorrhage", "laceration", "trauma", "blood loss", "severe bleeding"],
-        "score": 0.94
-    },
-    "anaphylaxis": {
-        "protocol": "Anaphylaxis Protocol",
-        "details": "Immediately administer epinephrine 0.3mg IM (anterolateral thigh). Establish IV access. Administer diphenhydramine 50mg IV and famotidine 20mg IV. Consider albuterol nebulizer for bronchospasm. Prepare for airway management.",
-        "contraindications": ["No absolute contraindications for epinephrine in anaphylaxis"],
-        "keywords": ["anaphylaxis", "allergic reaction", "severe allergy", "hives", "angioedema", "throat swelling"],
-        "score": 0.96
-    },
-    "hypoglycemia": {
-        "protocol": "Hypoglycemia Protocol",
-        "details": "Check blood glucose. If <60mg/dL and patient conscious, administer oral glucose 15g. If unconscious or unable to swallow, administer D50W 25g IV push or glucagon 1mg IM. Recheck glucose in 15 minutes.",
-        "contraindications": ["Do not give oral glucose if airway compromised"],
-        "keywords": ["hypoglycemia", "low blood sugar", "diabetic", "glucose", "altered mental status diabetic"],
-        "score": 0.92
-    },
-    "seizure": {
-        "protocol": "Seizure Management Protocol",
-        "details": "Protect patient from injury. Do not restrain. Establish IV access when safe. If seizure >5 minutes or status epilepticus, administer midazolam 10mg IM or lorazepam 2-4mg IV. Monitor airway and breathing.",
-        "contraindications": ["Do not force anything into mouth during active seizure"],
-        "keywords": ["seizure", "convulsion", "epilepsy", "fitting", "status epilepticus"],
-        "score": 0.90
-    },
-    "overdose": {
-        "protocol": "Overdose/Poisoning Protocol",
-        "details": "Assess airway, breathing, circulation. Administer naloxone 2-4mg IN/IM/IV for suspected opioid overdose. Consider activated charcoal if ingestion <1 hour and patient alert. Contact poison control. Monitor for respiratory depression.",
-        "contraindications": ["Activated charcoal contraindicated if airway not protected or caustic ingestion"],
-        "keywords": ["overdose", "poisoning", "narcan", "opioid", "intoxication", "drug abuse"],
-        "score": 0.89
-    },
-    "general_assessment": {
-        "protocol": "General Patient Assessment Protocol",
-        "details": "Perform primary assessment (ABC). Obtain vital signs. Complete SAMPLE history. Perform focused physical exam. Establish IV access if indicated. Monitor and reassess every 5-15 minutes.",
-        "contraindications": [],
-        "keywords": ["general", "assessment", "evaluation", "patient care"],
-        "score": 0.60
-    }
-}
-
-DRUG_INTERACTIONS_DB = {
-    "warfarin": {
-        "interacts_with": ["aspirin", "nsaids", "heparin"],
-        "risk": "CRITICAL - Increased bleeding risk",
-        "recommendation": "Avoid aspirin. Use extreme caution with any anticoagulant."
-    },
-    "aspirin": {
-        "interacts_with": ["warfarin", "heparin", "clopidogrel"],
-        "risk": "HIGH - Increased bleeding risk",
-        "recommendation": "Check for active bleeding or recent surgery before administration."
-    },
-    "nitroglycerin": {
-        "interacts_with": ["sildenafil", "tadalafil", "vardenafil"],
-        "risk": "CRITICAL - Severe hypotension",
-        "recommendation": "Do not give if patient took PDE5 inhibitor (Viagra, Cialis) within 24-48 hours."
-    },
-    "morphine": {
-        "interacts_with": ["benzodiazepines", "alcohol"],
-        "risk": "HIGH - Respiratory depression",
-        "recommendation": "Monitor respiratory status closely. Have naloxone ready."
-    },
-    "epinephrine": {
-        "interacts_with": ["beta-blockers", "maoi"],
-        "risk": "MODERATE - Altered response",
-        "recommendation": "May require higher doses if patient on beta-blockers."
-    }
+# SmartMemory storage: "log" (append-only delta log), "sqlite" or "json" (single JSON file)
+SMART_MEMORY_BACKEND = os.getenv("SMART_MEMORY_BACKEND", "log").lower()
+SMART_MEMORY_JSON_PATH = os.getenv("SMART_MEMORY_JSON_PATH", "./smart_memory_sessions.json")
+SMART_MEMORY_LOG_DIR = os.getenv("SMART_MEMORY_LOG_DIR", "./smart_memory")
+SMART_MEMORY_SQLITE_PATH = os.getenv("SMART_MEMORY_SQLITE_PATH", "./smart_memory.db")
+SMART_MEMORY_COMPACT_EVERY = int(os.getenv("SMART_MEMORY_COMPACT_EVERY", "500"))
+# Hot session cache; a flush interval of 0 disables write-behind (write-through)
+SMART_MEMORY_CACHE_SIZE = int(os.getenv("SMART_MEMORY_CACHE_SIZE", "1024"))
+SMART_MEMORY_CACHE_TTL = float(os.getenv("SMART_MEMORY_CACHE_TTL", "900"))
+SMART_MEMORY_FLUSH_INTERVAL = float(os.getenv("SMART_MEMORY_FLUSH_INTERVAL", "1.0"))
+# Threads used for SmartMemory disk I/O so it never runs on the event loop
+SMART_MEMORY_IO_WORKERS = int(os.getenv("SMART_MEMORY_IO_WORKERS", "4"))
+
+# Upstream connection pools and per-endpoint timeouts (seconds)
+CEREBRAS_MAX_CONNECTIONS = int(os.getenv("CEREBRAS_MAX_CONNECTIONS", "20"))
+ELEVENLABS_MAX_CONNECTIONS = int(os.getenv("ELEVENLABS_MAX_CONNECTIONS", "10"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "60"))
+CEREBRAS_TIMEOUTS = {
+    "risk_analysis": 10.0,
+    "sbar": 12.0,
+    "assistant": 8.0,
+    "protocol": 10.0,
+    "triage": 5.0
 }
+ELEVENLABS_TIMEOUT = 30.0
+
+# Upstream admission control: token-bucket rate (requests/s) and burst,
+# max concurrent calls, and how long a request may queue for a slot
+CEREBRAS_RATE_LIMIT = float(os.getenv("CEREBRAS_RATE_LIMIT", "10"))
+CEREBRAS_RATE_BURST = int(os.getenv("CEREBRAS_RATE_BURST", "20"))
+CEREBRAS_MAX_CONCURRENCY = int(os.getenv("CEREBRAS_MAX_CONCURRENCY", str(CEREBRAS_MAX_CONNECTIONS)))
+ELEVENLABS_RATE_LIMIT = float(os.getenv("ELEVENLABS_RATE_LIMIT", "5"))
+ELEVENLABS_RATE_BURST = int(os.getenv("ELEVENLABS_RATE_BURST", "10"))
+ELEVENLABS_MAX_CONCURRENCY = int(os.getenv("ELEVENLABS_MAX_CONCURRENCY", str(ELEVENLABS_MAX_CONNECTIONS)))
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "0.5"))
+# Circuit breaker: consecutive failures that open it, seconds before a probe is let through
+UPSTREAM_BREAKER_FAILURES = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+UPSTREAM_BREAKER_RESET_TIMEOUT = float(os.getenv("UPSTREAM_BREAKER_RESET_TIMEOUT", "15"))
+
+# TTS audio cache: in-memory LRU in front of an on-disk store, both size bounded
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "./tts_cache")
+TTS_CACHE_MEMORY_MB = float(os.getenv("TTS_CACHE_MEMORY_MB", "32"))
+TTS_CACHE_DISK_MB = float(os.getenv("TTS_CACHE_DISK_MB", "256"))
+# Synthesize common alerts and protocol readouts at startup (needs an ElevenLabs key)
+TTS_PREWARM = os.getenv("TTS_PREWARM", "true").lower() == "true"
+
+# Risk analysis only calls the LLM when the local rules are less confident than this (0-1)
+RISK_LLM_CONFIDENCE_THRESHOLD = float(os.getenv("RISK_LLM_CONFIDENCE_THRESHOLD", "0.8"))
+
+# Cache of LLM risk verdicts keyed on the prompt inputs; the default
+# near-duplicate threshold of 0 only reuses exact (normalized) transcript
+# matches. Near duplicates (0-1 token Jaccard) must still agree on every
+# number and negation word.
+RISK_CACHE_SIZE = int(os.getenv("RISK_CACHE_SIZE", "1024"))
+RISK_CACHE_TTL = float(os.getenv("RISK_CACHE_TTL", "300"))
+RISK_CACHE_NEAR_DUPLICATE_THRESHOLD = float(os.getenv("RISK_CACHE_NEAR_DUPLICATE_THRESHOLD", "0"))
+
+# End-to-end budgets (ms) for /analyze and /triage/calculate, overridable per
+# request with `deadline_ms`. The LLM gets this fraction of the budget; past
+# it the local rule result is returned
+ANALYZE_DEADLINE_MS = float(os.getenv("ANALYZE_DEADLINE_MS", "4000"))
+TRIAGE_DEADLINE_MS = float(os.getenv("TRIAGE_DEADLINE_MS", "3000"))
+LLM_DEADLINE_FRACTION = float(os.getenv("LLM_DEADLINE_FRACTION", "0.75"))
+# Hedged LLM requests: a duplicate call is sent once the first has been
+# outstanding for the observed p95 latency (needs LLM_HEDGE_MIN_SAMPLES calls)
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_MIN_DELAY_MS = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "50"))
+
+# /analyze/batch: max items per request and how many are analyzed at once
+ANALYZE_BATCH_MAX_ITEMS = int(os.getenv("ANALYZE_BATCH_MAX_ITEMS", "100"))
+ANALYZE_BATCH_CONCURRENCY = int(os.getenv("ANALYZE_BATCH_CONCURRENCY", "8"))
+
+# /ws/analyze: sentences of context kept per stream, seconds of silence
+# before an unfinished sentence is analyzed anyway, and the longest
+# unfinished sentence buffered before it is analyzed regardless
+TRANSCRIPT_WINDOW_SENTENCES = int(os.getenv("TRANSCRIPT_WINDOW_SENTENCES", "6"))
+TRANSCRIPT_DEBOUNCE_SECONDS = float(os.getenv("TRANSCRIPT_DEBOUNCE_SECONDS", "1.5"))
+TRANSCRIPT_MAX_PENDING_CHARS = int(os.getenv("TRANSCRIPT_MAX_PENDING_CHARS", "600"))
+
+# Vitals push channel: messages buffered per viewer before it is resynced with a snapshot
+VITALS_VIEWER_QUEUE_SIZE = int(os.getenv("VITALS_VIEWER_QUEUE_SIZE", "32"))
+
+# How often the event loop lag probe wakes up (seconds)
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.5"))
+
+# Protocol search: "keyword" (inverted index), "hybrid" (keyword + vector
+# fused with RRF), "vector" (local hashed n-gram embeddings with NumPy) or
+# "qdrant" (same embeddings in a local Qdrant)
+PROTOCOL_SEARCH_BACKEND = os.getenv("PROTOCOL_SEARCH_BACKEND", "keyword").lower()
+PROTOCOL_EMBEDDING_DIM = int(os.getenv("PROTOCOL_EMBEDDING_DIM", "512"))
+PROTOCOL_EMBEDDING_DIR = os.getenv("PROTOCOL_EMBEDDING_DIR", "./protocol_embeddings")
+# Cosine similarity a protocol needs when no keyword backs it up; off-topic
+# queries ("toothache", "sprained ankle") still score around 0.1
+PROTOCOL_VECTOR_MIN_SCORE = float(os.getenv("PROTOCOL_VECTOR_MIN_SCORE", "0.15"))
+QDRANT_LOCATION = os.getenv("QDRANT_LOCATION", ":memory:")
+PROTOCOL_RRF_K = int(os.getenv("PROTOCOL_RRF_K", "60"))
+# Normalized query -> top-k results; 0 disables the cache
+PROTOCOL_QUERY_CACHE_SIZE = int(os.getenv("PROTOCOL_QUERY_CACHE_SIZE", "512"))
+
+# Versioned protocol, drug interaction and hospital data files. They are
+# polled for changes (0 disables hot reload) and their compiled search
+# indexes are snapshotted to REFERENCE_INDEX_DIR for fast cold starts.
+REFERENCE_DATA_DIR = os.getenv("REFERENCE_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+REFERENCE_INDEX_DIR = os.getenv("REFERENCE_INDEX_DIR", "./reference_indexes")
+REFERENCE_DATA_POLL_INTERVAL = float(os.getenv("REFERENCE_DATA_POLL_INTERVAL", "2.0"))
 
 # ============================================================================
 # DATA MODELS
@@ -173,10 +205,11 @@ class SessionContext(BaseModel):
     session_id: str
     patient_vitals: PatientVitals
     patient_history: PatientHistory
-    administered_medications: List[str] = Field(default_factory=list)
+    administered_medications: List[Union[str, Dict[str, Any]]] = Field(default_factory=list)
     actions_taken: List[str] = Field(default_factory=list)
     warnings_issued: List[WarningEntry] = Field(default_factory=list)
     triage_result: Optional[Dict[str, Any]] = None
+    version: int = 0
     created_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
     updated_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
 
@@ -185,6 +218,13 @@ class AnalysisRequest(BaseModel):
     """Request model for medical risk analysis"""
     transcript: str
     session_id: str
+    deadline_ms: Optional[float] = Field(None, gt=0)  # defaults to ANALYZE_DEADLINE_MS
+
+
+class AnalysisBatchRequest(BaseModel):
+    """Request model for /analyze/batch; item deadlines default to the batch's"""
+    items: List[AnalysisRequest] = Field(..., min_length=1, max_length=ANALYZE_BATCH_MAX_ITEMS)
+    deadline_ms: Optional[float] = Field(None, gt=0)
 
 
 class TranscriptEntryModel(BaseModel):
@@ -226,6 +266,7 @@ class TriageRequest(BaseModel):
     respiratory_rate: Optional[int]
     pulse: Optional[int]
     mental_status: str  # "Alert", "Verbal", "Pain", "Unresponsive"
+    deadline_ms: Optional[float] = Field(None, gt=0)  # defaults to TRIAGE_DEADLINE_MS
 
 
 class TriageResult(BaseModel):
@@ -236,199 +277,1793 @@ class TriageResult(BaseModel):
     recommended_action: str
     ai_rationale: Optional[str] = None
     ai_advice: Optional[str] = None
+    ai_source: Optional[str] = None  # path that produced the rationale: llm, llm_hedged, deadline, fallback, local_only
+
+
+# ============================================================================
+# METRICS - Latency Histograms, Counters and Gauges (served at /metrics)
+# ============================================================================
+class LatencyHistogram:
+    """
+    Latency histogram in milliseconds: cumulative bucket counts plus a
+    rolling window of recent samples for percentiles
+    """
+
+    BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.bucket_counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self._recent: deque = deque(maxlen=window)
+
+    def observe(self, value_ms: float) -> None:
+        self.count += 1
+        self.total_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+        self._recent.append(value_ms)
+        for index, bound in enumerate(self.BUCKETS_MS):
+            if value_ms <= bound:
+                self.bucket_counts[index] += 1
+                return
+        self.bucket_counts[-1] += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """q in [0, 100] over the recent window, None if nothing was observed"""
+        if not self._recent:
+            return None
+        ordered = sorted(self._recent)
+        return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"le_{bound}" for bound in self.BUCKETS_MS] + ["le_inf"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "buckets": dict(zip(labels, self.bucket_counts))
+        }
+
+
+class MetricsRegistry:
+    """Process-wide counters, latency histograms and callback gauges"""
+
+    def __init__(self):
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.gauges: Dict[str, Callable[[], Any]] = {}
+
+    def incr(self, name: str, value: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        if name not in self.histograms:
+            self.histograms[name] = LatencyHistogram()
+        return self.histograms[name]
+
+    def observe(self, name: str, value_ms: float) -> None:
+        self.histogram(name).observe(value_ms)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Record the wall time of a block in milliseconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000)
+
+    def register_gauge(self, name: str, read: Callable[[], Any]) -> None:
+        self.gauges[name] = read
+
+    def snapshot(self) -> Dict[str, Any]:
+        gauges = {}
+        for name, read in self.gauges.items():
+            try:
+                gauges[name] = read()
+            except Exception as e:
+                gauges[name] = f"error: {e}"
+        return {
+            "counters": dict(self.counters),
+            "gauges": gauges,
+            "histograms": {name: hist.snapshot() for name, hist in self.histograms.items()},
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+
+metrics = MetricsRegistry()
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """Measure how late the loop wakes a sleeping task; blocking calls show up as lag"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag_ms = max(0.0, (loop.time() - start - interval) * 1000)
+        metrics.observe("event_loop.lag_ms", lag_ms)
 
 
 # ============================================================================
 # RAINDROP SMARTMEMORY - Persistent Session Management
 # ============================================================================
-class SmartMemoryManager:
+def _fsync_directory(directory: str) -> None:
+    """Persist a rename by syncing the parent directory (no-op where unsupported)"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _atomic_write_json(path: str, data: Any, indent: Optional[int] = None) -> None:
+    """Write JSON to a temp file, fsync it, then rename it over the target"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_directory(os.path.dirname(os.path.abspath(path)))
+
+
+def _read_json_sessions(path: str) -> Dict[str, Any]:
+    """Safely load a SmartMemory JSON file (missing or corrupt files read as empty)"""
+    try:
+        with open(path, 'r') as f:
+            content = f.read().strip()
+            if not content:
+                return {}
+            return json.loads(content)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+class SessionStore(ABC):
     """
-    Manages persistent patient session data using Raindrop's SmartMemory
-    Uses local JSON storage as implementation
+    Storage backend interface for SmartMemory
+    Backends persist plain session dicts keyed by session_id
     """
-    
-    def __init__(self, storage_path: str = "./smart_memory_sessions.json"):
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def save(self, session_id: str, data: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def load_all(self) -> Dict[str, Dict[str, Any]]:
+        ...
+
+    def load_many(self, session_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Load several sessions; ids that don't exist are left out"""
+        sessions = {}
+        for session_id in session_ids:
+            data = self.load(session_id)
+            if data is not None:
+                sessions[session_id] = data
+        return sessions
+
+    def count(self) -> int:
+        return len(self.load_all())
+
+    def list_sessions(self, updated_since: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Most recently updated sessions first, optionally only those updated after a timestamp"""
+        sessions = [
+            data for data in self.load_all().values()
+            if updated_since is None or data.get("updated_at", "") > updated_since
+        ]
+        sessions.sort(key=lambda data: data.get("updated_at", ""), reverse=True)
+        return sessions[:limit]
+
+    def vitals_history(self, session_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Most recent vitals readings for a session, oldest first (only the current one without a history table)"""
+        data = self.load(session_id)
+        if data is None or limit <= 0:
+            return []
+        return [data.get("patient_vitals") or {}]
+
+    def close(self) -> None:
+        """Release any file handles held by the backend"""
+
+    def import_json(self, json_path: str) -> int:
+        """Import sessions from a SmartMemory JSON file, returns the number imported"""
+        sessions = _read_json_sessions(json_path)
+        for session_id, data in sessions.items():
+            self.save(session_id, data)
+        return len(sessions)
+
+    def export_json(self, json_path: str) -> int:
+        """Export all sessions to a SmartMemory JSON file, returns the number exported"""
+        sessions = self.load_all()
+        _atomic_write_json(json_path, sessions, indent=2)
+        return len(sessions)
+
+
+class JsonFileSessionStore(SessionStore):
+    """
+    Original single-file backend: every write re-serializes all sessions
+    """
+
+    def __init__(self, storage_path: str):
         self.storage_path = storage_path
         self._ensure_storage_exists()
-    
+
     def _ensure_storage_exists(self) -> None:
         """Initialize storage file if it doesn't exist"""
         if not os.path.exists(self.storage_path):
             with open(self.storage_path, 'w') as f:
                 json.dump({}, f)
 
-    def _load_sessions(self) -> Dict[str, Any]:
-        """Safely load sessions from storage"""
-        try:
-            with open(self.storage_path, 'r') as f:
-                content = f.read().strip()
-                if not content:
-                    return {}
-                return json.loads(content)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return _read_json_sessions(self.storage_path).get(session_id)
+
+    def save(self, session_id: str, data: Dict[str, Any]) -> None:
+        sessions = _read_json_sessions(self.storage_path)
+        sessions[session_id] = data
+        _atomic_write_json(self.storage_path, sessions, indent=2)
+
+    def load_all(self) -> Dict[str, Dict[str, Any]]:
+        return _read_json_sessions(self.storage_path)
+
+
+class AppendOnlyLogSessionStore(SessionStore):
+    """
+    Append-only SmartMemory backend
+
+    Each save appends one JSON line holding only the fields that changed
+    ("set") or the items appended to list fields ("ext"), so a write costs
+    O(size of the change). Every `compact_every` records the live state is
+    written to a snapshot (fsync + rename) and the log is restarted under a
+    new generation number, so a crash mid-compaction never replays deltas
+    twice.
+    """
+
+    def __init__(self, directory: str, compact_every: int = 500, fsync: bool = True):
+        self.directory = directory
+        self.snapshot_path = os.path.join(directory, "snapshot.json")
+        self.log_path = os.path.join(directory, "sessions.log")
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._generation = 0
+        self._log_records = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+        self._log_file = open(self.log_path, 'a', encoding='utf-8')
+
+    # -- recovery ----------------------------------------------------------
+    def _recover(self) -> None:
+        """Load the snapshot, then replay the log (dropping a torn final line)"""
+        snapshot = _read_json_sessions(self.snapshot_path)
+        self._generation = snapshot.get("generation", 0)
+        self._sessions = snapshot.get("sessions", {})
+
+        if not os.path.exists(self.log_path):
+            self._start_log()
+            return
+
+        good_offset = 0
+        log_generation = None
+        with open(self.log_path, 'rb') as f:
+            for raw_line in f:
+                try:
+                    record = json.loads(raw_line)
+                except json.JSONDecodeError:
+                    break
+                if not raw_line.endswith(b"\n"):
+                    break
+                good_offset += len(raw_line)
+                if log_generation is None:
+                    log_generation = record.get("generation", 0)
+                    continue
+                if log_generation == self._generation:
+                    self._apply(record)
+                    self._log_records += 1
+
+        if log_generation != self._generation:
+            # Log predates the current snapshot (crash after snapshot rename)
+            self._start_log()
+        elif good_offset < os.path.getsize(self.log_path):
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(good_offset)
+
+    def _start_log(self) -> None:
+        """Atomically replace the log with an empty one for the current generation"""
+        tmp_path = f"{self.log_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"generation": self._generation}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.log_path)
+        _fsync_directory(self.directory)
+        self._log_records = 0
+
+    # -- deltas ------------------------------------------------------------
+    @staticmethod
+    def _delta(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+        changed: Dict[str, Any] = {}
+        extended: Dict[str, Any] = {}
+        for key, value in new.items():
+            if key in old and old[key] == value:
+                continue
+            previous = old.get(key)
+            if (
+                isinstance(value, list)
+                and isinstance(previous, list)
+                and len(value) > len(previous)
+                and value[:len(previous)] == previous
+            ):
+                extended[key] = value[len(previous):]
+            else:
+                changed[key] = value
+        delta: Dict[str, Any] = {}
+        if changed:
+            delta["set"] = changed
+        if extended:
+            delta["ext"] = extended
+        return delta
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        session = self._sessions.setdefault(record["id"], {})
+        session.update(record.get("set", {}))
+        for key, items in record.get("ext", {}).items():
+            session[key] = session.get(key, []) + items
+
+    # -- SessionStore API --------------------------------------------------
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            data = self._sessions.get(session_id)
+            return json.loads(json.dumps(data)) if data is not None else None
+
+    def save(self, session_id: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            delta = self._delta(self._sessions.get(session_id, {}), data)
+            if not delta:
+                return
+            record = {"id": session_id, **delta}
+            self._log_file.write(json.dumps(record) + "\n")
+            self._log_file.flush()
+            if self.fsync:
+                os.fsync(self._log_file.fileno())
+            self._apply(record)
+            self._log_records += 1
+            if self._log_records >= self.compact_every:
+                self._compact()
+
+    def load_all(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return json.loads(json.dumps(self._sessions))
+
+    def compact(self) -> None:
+        """Fold the log into a fresh snapshot"""
+        with self._lock:
+            self._compact()
+
+    def _compact(self) -> None:
+        self._generation += 1
+        _atomic_write_json(self.snapshot_path, {
+            "generation": self._generation,
+            "sessions": self._sessions
+        })
+        self._log_file.close()
+        self._start_log()
+        self._log_file = open(self.log_path, 'a', encoding='utf-8')
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._log_file.closed:
+                self._log_file.close()
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    SQLite SmartMemory backend (WAL journal)
+
+    One row per session plus append-only child tables for administered
+    medications, issued warnings and the vitals history, so a save only
+    inserts the new list items. Sessions are indexed by session_id (primary
+    key) and updated_at.
+    """
+
+    SESSION_COLUMNS = ("patient_vitals", "patient_history", "actions_taken", "triage_result")
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        patient_vitals TEXT NOT NULL,
+        patient_history TEXT NOT NULL,
+        actions_taken TEXT NOT NULL,
+        triage_result TEXT,
+        extra TEXT NOT NULL DEFAULT '{}',
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions(updated_at);
+    CREATE TABLE IF NOT EXISTS session_medications (
+        session_id TEXT NOT NULL REFERENCES sessions(session_id) ON DELETE CASCADE,
+        seq INTEGER NOT NULL,
+        medication TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        PRIMARY KEY (session_id, seq)
+    );
+    CREATE TABLE IF NOT EXISTS session_warnings (
+        session_id TEXT NOT NULL REFERENCES sessions(session_id) ON DELETE CASCADE,
+        seq INTEGER NOT NULL,
+        timestamp TEXT NOT NULL,
+        warning TEXT NOT NULL,
+        PRIMARY KEY (session_id, seq)
+    );
+    CREATE TABLE IF NOT EXISTS session_vitals_history (
+        session_id TEXT NOT NULL REFERENCES sessions(session_id) ON DELETE CASCADE,
+        seq INTEGER NOT NULL,
+        recorded_at TEXT NOT NULL,
+        vitals TEXT NOT NULL,
+        PRIMARY KEY (session_id, seq)
+    );
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(self.SCHEMA)
+
+    def _sync_children(self, table: str, session_id: str, rows: List[tuple]) -> None:
+        """Insert only the rows beyond what is stored; rewrite if the list shrank"""
+        stored = self._conn.execute(
+            f"SELECT COUNT(*) FROM {table} WHERE session_id = ?", (session_id,)
+        ).fetchone()[0]
+        if len(rows) < stored:
+            self._conn.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+            stored = 0
+        if len(rows) == stored:
+            return
+        placeholders = ", ".join("?" * (len(rows[0]) + 2))
+        self._conn.executemany(
+            f"INSERT INTO {table} VALUES ({placeholders})",
+            [(session_id, seq, *row) for seq, row in enumerate(rows) if seq >= stored]
+        )
+
+    def save(self, session_id: str, data: Dict[str, Any]) -> None:
+        known = {"session_id", "administered_medications", "warnings_issued", "created_at", "updated_at", *self.SESSION_COLUMNS}
+        extra = {key: value for key, value in data.items() if key not in known}
+        vitals_json = json.dumps(data.get("patient_vitals") or {})
+
+        with self._lock, self._conn:
+            previous = self._conn.execute(
+                "SELECT patient_vitals FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            self._conn.execute(
+                """
+                INSERT INTO sessions (session_id, patient_vitals, patient_history, actions_taken,
+                                      triage_result, extra, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    patient_vitals = excluded.patient_vitals,
+                    patient_history = excluded.patient_history,
+                    actions_taken = excluded.actions_taken,
+                    triage_result = excluded.triage_result,
+                    extra = excluded.extra,
+                    updated_at = excluded.updated_at
+                """,
+                (
+                    session_id,
+                    vitals_json,
+                    json.dumps(data.get("patient_history") or {}),
+                    json.dumps(data.get("actions_taken") or []),
+                    json.dumps(data["triage_result"]) if data.get("triage_result") is not None else None,
+                    json.dumps(extra),
+                    data.get("created_at") or datetime.utcnow().isoformat(),
+                    data.get("updated_at") or datetime.utcnow().isoformat()
+                )
+            )
+            if previous is None or previous["patient_vitals"] != vitals_json:
+                seq = self._conn.execute(
+                    "SELECT COALESCE(MAX(seq) + 1, 0) FROM session_vitals_history WHERE session_id = ?",
+                    (session_id,)
+                ).fetchone()[0]
+                self._conn.execute(
+                    "INSERT INTO session_vitals_history VALUES (?, ?, ?, ?)",
+                    (session_id, seq, (data.get("patient_vitals") or {}).get("timestamp") or data.get("updated_at", ""), vitals_json)
+                )
+            self._sync_children("session_medications", session_id, [
+                (med["medication"] if isinstance(med, dict) else med, json.dumps(med))
+                for med in data.get("administered_medications", [])
+            ])
+            self._sync_children("session_warnings", session_id, [
+                (warning["timestamp"], warning["warning"])
+                for warning in data.get("warnings_issued", [])
+            ])
+
+    def _row_to_session(self, row: sqlite3.Row) -> Dict[str, Any]:
+        session_id = row["session_id"]
+        medications = self._conn.execute(
+            "SELECT payload FROM session_medications WHERE session_id = ? ORDER BY seq", (session_id,)
+        ).fetchall()
+        warnings = self._conn.execute(
+            "SELECT timestamp, warning FROM session_warnings WHERE session_id = ? ORDER BY seq", (session_id,)
+        ).fetchall()
+        return {
+            "session_id": session_id,
+            "patient_vitals": json.loads(row["patient_vitals"]),
+            "patient_history": json.loads(row["patient_history"]),
+            "administered_medications": [json.loads(med["payload"]) for med in medications],
+            "actions_taken": json.loads(row["actions_taken"]),
+            "warnings_issued": [{"timestamp": w["timestamp"], "warning": w["warning"]} for w in warnings],
+            "triage_result": json.loads(row["triage_result"]) if row["triage_result"] else None,
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            **json.loads(row["extra"])
+        }
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            return self._row_to_session(row) if row else None
+
+    # Stay well under SQLite's bound-parameter limit
+    LOAD_MANY_CHUNK = 500
+
+    def load_many(self, session_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        sessions = {}
+        with self._lock:
+            for offset in range(0, len(session_ids), self.LOAD_MANY_CHUNK):
+                chunk = list(session_ids[offset:offset + self.LOAD_MANY_CHUNK])
+                placeholders = ", ".join("?" for _ in chunk)
+                rows = self._conn.execute(
+                    f"SELECT * FROM sessions WHERE session_id IN ({placeholders})", chunk
+                ).fetchall()
+                for row in rows:
+                    sessions[row["session_id"]] = self._row_to_session(row)
+        return sessions
+
+    def load_all(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM sessions").fetchall()
+            return {row["session_id"]: self._row_to_session(row) for row in rows}
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def list_sessions(self, updated_since: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM sessions WHERE updated_at > ? ORDER BY updated_at DESC LIMIT ?",
+                (updated_since or "", limit)
+            ).fetchall()
+            return [self._row_to_session(row) for row in rows]
+
+    def vitals_history(self, session_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Most recent vitals readings for a session, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT vitals FROM session_vitals_history WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+                (session_id, limit)
+            ).fetchall()
+            return [json.loads(row["vitals"]) for row in reversed(rows)]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_json_to_sqlite(json_path: str, db_path: str) -> int:
+    """One-off migration of a SmartMemory JSON file into a SQLite database"""
+    store = SqliteSessionStore(db_path)
+    try:
+        return store.import_json(json_path)
+    finally:
+        store.close()
+
+
+def build_session_store() -> SessionStore:
+    """Create the configured SmartMemory backend"""
+    if SMART_MEMORY_BACKEND == "json":
+        return JsonFileSessionStore(SMART_MEMORY_JSON_PATH)
+    if SMART_MEMORY_BACKEND == "sqlite":
+        store = SqliteSessionStore(SMART_MEMORY_SQLITE_PATH)
+    elif SMART_MEMORY_BACKEND == "log":
+        store = AppendOnlyLogSessionStore(SMART_MEMORY_LOG_DIR, compact_every=SMART_MEMORY_COMPACT_EVERY)
+    else:
+        raise ValueError(f"Unknown SMART_MEMORY_BACKEND: {SMART_MEMORY_BACKEND}")
+
+    # First start on a new backend: seed it from the legacy JSON file
+    if store.count() == 0 and os.path.exists(SMART_MEMORY_JSON_PATH):
+        imported = store.import_json(SMART_MEMORY_JSON_PATH)
+        if isinstance(store, AppendOnlyLogSessionStore):
+            store.compact()
+        print(f"Imported {imported} sessions from {SMART_MEMORY_JSON_PATH}")
+    return store
+
+
+class SessionConflictError(Exception):
+    """Raised when a session was written by someone else since it was read"""
+
+
+@dataclass
+class _CachedSession:
+    """Live session held by the SmartMemory hot cache"""
+    session: SessionContext
+    last_access: float
+
+
+class SmartMemoryManager:
+    """
+    Manages persistent patient session data using Raindrop's SmartMemory
+    Storage is delegated to a pluggable SessionStore backend
+
+    Live sessions are kept in an LRU/TTL cache. Updates mark the session dirty
+    and a write-behind flusher persists dirty sessions in batches, so reads and
+    writes on the request path never touch disk (set flush_interval=0 for
+    write-through).
+
+    Writes are versioned compare-and-swap: update_session only succeeds if
+    the session's version still matches the stored one. Request handlers go
+    through mutate_session, which serializes read-modify-write per session
+    with an asyncio lock while unrelated sessions proceed in parallel.
+
+    The `a*` methods are the async API used by the endpoints: cache hits are
+    served on the loop, anything that may touch the store runs on a bounded
+    thread pool so disk I/O never blocks the event loop.
+
+    Two locks: `_lock` guards the in-memory state and is never held across
+    store I/O, so the loop only ever waits on dict operations. `_io_lock`
+    orders store reads and writes against each other (taken before `_lock`,
+    never on the loop), so a session read from the store cannot overtake a
+    newer copy that is still being written.
+    """
+    
+    def __init__(
+        self,
+        store: Optional[SessionStore] = None,
+        storage_path: str = "./smart_memory_sessions.json",
+        cache_size: int = 1024,
+        cache_ttl: float = 900.0,
+        flush_interval: float = 1.0,
+        io_workers: int = 4
+    ):
+        self.storage_path = storage_path
+        self.store = store or JsonFileSessionStore(storage_path)
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.flush_interval = flush_interval
+        self._cache: "OrderedDict[str, _CachedSession]" = OrderedDict()
+        self._dirty: Set[str] = set()
+        # Dirty sessions pushed out of the LRU, waiting for the next flush
+        self._pending: Dict[str, SessionContext] = {}
+        self._lock = threading.RLock()
+        self._io_lock = threading.RLock()
+        self._session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._flusher_task: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="smart-memory-io")
+        metrics.register_gauge("smart_memory.cached_sessions", lambda: len(self._cache))
+        metrics.register_gauge("smart_memory.dirty_sessions", lambda: len(self._dirty) + len(self._pending))
     
+    # -- hot cache ---------------------------------------------------------
+    def _cache_put(self, session: SessionContext) -> None:
+        self._pending.pop(session.session_id, None)
+        self._cache[session.session_id] = _CachedSession(session, time.monotonic())
+        self._cache.move_to_end(session.session_id)
+        while len(self._cache) > self.cache_size:
+            session_id, entry = self._cache.popitem(last=False)
+            if session_id in self._dirty:
+                self._dirty.discard(session_id)
+                self._pending[session_id] = entry.session
+
+    def expire(self) -> int:
+        """Drop clean sessions that have not been touched within the TTL"""
+        cutoff = time.monotonic() - self.cache_ttl
+        with self._lock:
+            expired = [
+                session_id for session_id, entry in self._cache.items()
+                if entry.last_access < cutoff and session_id not in self._dirty
+            ]
+            for session_id in expired:
+                del self._cache[session_id]
+        return len(expired)
+
+    def flush(self) -> int:
+        """Persist every dirty session to the backing store (blocking)"""
+        with self._io_lock:
+            with self._lock:
+                batch = {session_id: self._cache[session_id].session for session_id in self._dirty}
+                batch.update(self._pending)
+                self._dirty.clear()
+                self._pending.clear()
+            if not batch:
+                return 0
+            # Keep saving past a failure; every session that wasn't written stays dirty
+            first_error: Optional[Exception] = None
+            saved = 0
+            with metrics.timer("smart_memory.flush_ms"):
+                for session_id, session in batch.items():
+                    try:
+                        self.store.save(session_id, session.model_dump())
+                        saved += 1
+                    except Exception as e:
+                        first_error = first_error or e
+                        with self._lock:
+                            if session_id not in self._cache and session_id not in self._pending:
+                                self._pending[session_id] = session
+                            elif session_id in self._cache:
+                                self._dirty.add(session_id)
+        metrics.incr("smart_memory.sessions_flushed", saved)
+        if first_error is not None:
+            raise first_error
+        return saved
+
+    async def _run_io(self, fn: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def run_flusher(self) -> None:
+        """Write-behind loop: flush dirty sessions and expire idle ones"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self._run_io(self.flush)
+                self.expire()
+            except Exception as e:
+                print(f"SmartMemory flush failed: {str(e)}")
+
+    def start(self) -> None:
+        if self.flush_interval > 0 and self._flusher_task is None:
+            self._flusher_task = asyncio.create_task(self.run_flusher())
+
+    async def stop(self) -> None:
+        if self._flusher_task is not None:
+            self._flusher_task.cancel()
+            try:
+                await self._flusher_task
+            except asyncio.CancelledError:
+                pass
+            self._flusher_task = None
+        await self._run_io(self.flush)
+
+    # -- session API -------------------------------------------------------
+    def _memory_copy(self, session_id: str) -> Optional[SessionContext]:
+        """Copy of a cached or pending session, None if it has to be read from the store"""
+        entry = self._cache.get(session_id)
+        if entry is not None:
+            entry.last_access = time.monotonic()
+            self._cache.move_to_end(session_id)
+            return entry.session.model_copy(deep=True)
+        if session_id in self._pending:
+            session = self._pending[session_id]
+            self._cache_put(session)
+            self._dirty.add(session_id)
+            return session.model_copy(deep=True)
+        return None
+
+    def _memory_copies(self, session_ids: Sequence[str]) -> Tuple[Dict[str, SessionContext], List[str]]:
+        """Copies of the in-memory sessions among `session_ids`, and the ids that have to be read from the store"""
+        sessions: Dict[str, SessionContext] = {}
+        missing = []
+        with self._lock:
+            for session_id in session_ids:
+                session = self._memory_copy(session_id)
+                if session is None:
+                    missing.append(session_id)
+                else:
+                    sessions[session_id] = session
+        return sessions, missing
+
+    def _load_sessions(self, session_ids: Sequence[str]) -> Dict[str, SessionContext]:
+        """Read sessions from the store into the cache; the store is read without holding `_lock`"""
+        with self._io_lock:
+            # Another thread may have loaded or written some of them meanwhile
+            sessions, missing = self._memory_copies(session_ids)
+            if not missing:
+                return sessions
+            if len(missing) == 1:
+                data = self.store.load(missing[0])
+                loaded = {missing[0]: data} if data is not None else {}
+            else:
+                loaded = self.store.load_many(missing)
+            with self._lock:
+                for session_id, data in loaded.items():
+                    session = SessionContext(**data)
+                    self._cache_put(session)
+                    sessions[session_id] = session.model_copy(deep=True)
+        return sessions
+
     def get_session(self, session_id: str) -> Optional[SessionContext]:
         """Retrieve session context from SmartMemory"""
-        sessions = self._load_sessions()
-        
-        if session_id in sessions:
-            return SessionContext(**sessions[session_id])
-        return None
+        sessions, missing = self._memory_copies([session_id])
+        if missing:
+            sessions = self._load_sessions(missing)
+        return sessions.get(session_id)
+
+    def get_sessions(self, session_ids: Sequence[str]) -> Dict[str, SessionContext]:
+        """Retrieve several sessions; cache misses are read with one store.load_many call"""
+        sessions, missing = self._memory_copies(session_ids)
+        if missing:
+            sessions.update(self._load_sessions(missing))
+        return sessions
     
-    def update_session(self, session_context: SessionContext) -> SessionContext:
-        """Update session context in SmartMemory"""
+    def _memory_version(self, session_id: str) -> Optional[int]:
+        entry = self._cache.get(session_id)
+        if entry is not None:
+            return entry.session.version
+        if session_id in self._pending:
+            return self._pending[session_id].version
+        return None
+
+    def _install(self, session_context: SessionContext, current_version: Optional[int]) -> None:
+        """Version check and cache write of an update (caller holds `_lock`)"""
+        if current_version is not None and current_version != session_context.version:
+            raise SessionConflictError(
+                f"Session {session_context.session_id} is at version {current_version}, "
+                f"update was based on version {session_context.version}"
+            )
+        session_context.version += 1
         session_context.updated_at = datetime.utcnow().isoformat()
-        
-        sessions = self._load_sessions()
-        
-        sessions[session_context.session_id] = session_context.model_dump()
-        
-        with open(self.storage_path, 'w') as f:
-            json.dump(sessions, f, indent=2)
-        
+
+        self._cache_put(session_context.model_copy(deep=True))
+        if self.flush_interval > 0:
+            self._dirty.add(session_context.session_id)
+
+    def _update_in_memory(self, session_context: SessionContext) -> bool:
+        """Write-behind update of a cached or pending session; False if it first has to be read from the store"""
+        with self._lock:
+            current_version = self._memory_version(session_context.session_id)
+            if current_version is None:
+                return False
+            self._install(session_context, current_version)
+            return True
+
+    def _write(self, session_context: SessionContext, replace: bool = False) -> SessionContext:
+        """Update that may read the stored version or write through to the store"""
+        session_id = session_context.session_id
+        with self._io_lock:
+            with self._lock:
+                stored = self._memory_version(session_id) is None
+            # Only I/O-lock holders bring a session into memory, so this read stays current
+            stored_version = None
+            if stored:
+                data = self.store.load(session_id)
+                stored_version = data.get("version", 0) if data is not None else None
+            with self._lock:
+                current_version = self._memory_version(session_id)
+                if current_version is None:
+                    current_version = stored_version
+                if replace:
+                    session_context.version = current_version or 0
+                self._install(session_context, current_version)
+            if self.flush_interval <= 0:
+                self.store.save(session_id, session_context.model_dump())
         return session_context
+
+    def update_session(self, session_context: SessionContext) -> SessionContext:
+        """
+        Update session context in SmartMemory
+
+        Raises SessionConflictError if the session changed since it was read.
+        """
+        if self.flush_interval > 0 and self._update_in_memory(session_context):
+            return session_context
+        return self._write(session_context)
     
     def create_session(self, session_id: str) -> SessionContext:
-        """Create a new patient session"""
+        """Create a new patient session (replaces any existing one with the same id)"""
         session_context = SessionContext(
             session_id=session_id,
             patient_vitals=PatientVitals(),
             patient_history=PatientHistory()
         )
-        return self.update_session(session_context)
-
+        return self._write(session_context, replace=True)
+
+    def session_lock(self, session_id: str) -> asyncio.Lock:
+        """Per-session lock; dropped automatically once no task holds or waits on it"""
+        lock = self._session_locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._session_locks[session_id] = lock
+        return lock
+
+    async def mutate_session(
+        self,
+        session_id: str,
+        mutator: Callable[[SessionContext], Any],
+        max_retries: int = 3
+    ) -> Optional[SessionContext]:
+        """
+        Apply `mutator` to the latest copy of a session and save it atomically
 
-# ============================================================================
-# IN-MEMORY HOSPITAL DATABASE
-# ============================================================================
-HOSPITALS_DB = [
-    {
-        "id": "hosp_001",
-        "name": "General City Hospital",
-        "distance_miles": 2.4,
-        "total_beds": 450,
-        "available_beds": 42,
-        "specialties": ["Stroke Center", "Cardiology"],
-        "status": "Normal"
-    },
-    {
-        "id": "hosp_002",
-        "name": "St. Mary's Trauma Center",
-        "distance_miles": 5.8,
-        "total_beds": 600,
-        "available_beds": 12,
-        "specialties": ["Level 1 Trauma", "Burn Unit", "Neurosurgery"],
-        "status": "Busy"
-    },
-    {
-        "id": "hosp_003",
-        "name": "Community Health Clinic",
-        "distance_miles": 1.2,
-        "total_beds": 50,
-        "available_beds": 15,
-        "specialties": ["Urgent Care", "Pediatrics"],
-        "status": "Normal"
-    },
-    {
-        "id": "hosp_004",
-        "name": "University Research Hospital",
-        "distance_miles": 8.5,
-        "total_beds": 800,
-        "available_beds": 3,
-        "specialties": ["Oncology", "Transplant", "Rare Diseases"],
-        "status": "Diverting"
-    },
-    {
-        "id": "hosp_005",
-        "name": "Northside Medical Center",
-        "distance_miles": 12.1,
-        "total_beds": 350,
-        "available_beds": 45,
-        "specialties": ["Orthopedics", "Sports Medicine"],
-        "status": "Normal"
-    },
-    {
-        "id": "hosp_006",
-        "name": "Veterans Memorial Hospital",
-        "distance_miles": 4.2,
-        "total_beds": 200,
-        "available_beds": 10,
-        "specialties": ["Geriatrics", "Psychiatry"],
-        "status": "Busy"
-    }
-]
+        Returns None if the session does not exist. A version conflict (a
+        writer that bypassed the lock) re-reads and re-applies the mutation.
+        """
+        async with self.session_lock(session_id):
+            for attempt in range(max_retries + 1):
+                session = await self.aget_session(session_id)
+                if session is None:
+                    return None
+                mutator(session)
+                try:
+                    return await self.aupdate_session(session)
+                except SessionConflictError:
+                    if attempt == max_retries:
+                        raise
+
+    # -- async API ---------------------------------------------------------
+    async def aget_session(self, session_id: str) -> Optional[SessionContext]:
+        """Async get_session: memory hits stay on the loop, store reads go to the I/O pool"""
+        sessions, missing = self._memory_copies([session_id])
+        if missing:
+            sessions = await self._run_io(self._load_sessions, missing)
+        return sessions.get(session_id)
+
+    async def aget_sessions(self, session_ids: Sequence[str]) -> Dict[str, SessionContext]:
+        """Async get_sessions: a single I/O pool hop covers every store read"""
+        sessions, missing = self._memory_copies(session_ids)
+        if missing:
+            sessions.update(await self._run_io(self._load_sessions, missing))
+        return sessions
+
+    async def aupdate_session(self, session_context: SessionContext) -> SessionContext:
+        """Async update_session: write-behind updates of cached sessions never touch the store"""
+        if self.flush_interval > 0 and self._update_in_memory(session_context):
+            return session_context
+        return await self._run_io(self._write, session_context)
+
+    async def acreate_session(self, session_id: str) -> SessionContext:
+        return await self._run_io(self.create_session, session_id)
+
+    async def alist_sessions(self, updated_since: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        return await self._run_io(self.list_sessions, updated_since, limit)
+
+    async def aexport_json(self, path: Optional[str] = None) -> int:
+        return await self._run_io(self.export_json, path)
+
+    async def avitals_history(self, session_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        return await self._run_io(self.vitals_history, session_id, limit)
+
+    def list_sessions(self, updated_since: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Recently updated sessions, newest first (served by the store's updated_at index)"""
+        self.flush()
+        return self.store.list_sessions(updated_since=updated_since, limit=limit)
+
+    def vitals_history(self, session_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Saved vitals readings for a session, oldest first (one per stored version that changed them)"""
+        self.flush()
+        return self.store.vitals_history(session_id, limit=limit)
+
+    def export_json(self, path: Optional[str] = None) -> int:
+        """Export every session to the SmartMemory JSON format"""
+        self.flush()
+        return self.store.export_json(path or self.storage_path)
+
+    def close(self) -> None:
+        self.flush()
+        self._executor.shutdown(wait=True)
+        self.store.close()
 
 
 # ============================================================================
 # IN-MEMORY PROTOCOL SEARCH (Replaces Qdrant)
 # ============================================================================
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _write_index_snapshot(path: str, write: Callable[[Any], None]) -> None:
+    """
+    Atomically write an index snapshot file and drop older snapshots of the
+    same kind (same name prefix up to the fingerprint) from its directory
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    name = os.path.basename(path)
+    prefix = name.split("-", 1)[0] + "-"
+    extension = os.path.splitext(name)[1]
+    for other in os.listdir(directory):
+        if other != name and other.startswith(prefix) and other.endswith(extension):
+            os.remove(os.path.join(directory, other))
+
+
+def normalize_token(token: str) -> str:
+    """Lowercase and strip simple plurals so 'seizures' matches 'seizure'"""
+    token = token.lower()
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[Tuple[str, int, int]]:
+    """Split text into normalized tokens with their (start, end) character spans"""
+    return [
+        (normalize_token(match.group()), match.start(), match.end())
+        for match in _TOKEN_PATTERN.finditer(text.lower())
+    ]
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over token sequences
+
+    Patterns are token lists (so multi-word phrases like "shortness of
+    breath" match on word boundaries) and a scan reports every pattern
+    occurrence in one pass over the text, however many patterns there are.
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[Tuple[int, Any]]] = [[]]
+        self._built = False
+
+    def add(self, tokens: Sequence[str], value: Any) -> None:
+        if not tokens:
+            return
+        node = 0
+        for token in tokens:
+            next_node = self._goto[node].get(token)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][token] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            node = next_node
+        self._outputs[node].append((len(tokens), value))
+        self._built = False
+
+    def build(self) -> None:
+        """Compute failure links breadth-first and merge outputs along them"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(token, 0)
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+        self._built = True
+
+    def iter_matches(self, tokens: Sequence[str]) -> Iterator[Tuple[int, int, Any]]:
+        """Yield (start_index, end_index, value) for every pattern occurrence"""
+        if not self._built:
+            self.build()
+        node = 0
+        for position, token in enumerate(tokens):
+            node = self.step(node, token)
+            for length, value in self._outputs[node]:
+                yield position - length + 1, position + 1, value
+
+    def step(self, node: int, token: str) -> int:
+        """Advance the automaton by one token (for callers that scan incrementally)"""
+        while node and token not in self._goto[node]:
+            node = self._fail[node]
+        return self._goto[node].get(token, 0)
+
+    def outputs(self, node: int) -> List[Tuple[int, Any]]:
+        """(pattern length, value) for every pattern ending at this node"""
+        return self._outputs[node]
+
+
 class InMemoryProtocolSearch:
     """
-    In-memory medical protocol search using keyword matching
+    In-memory medical protocol search using an inverted keyword index
     Fallback approach when Qdrant/Vultr is not available
+
+    The index is built once: protocol keywords are tokenized into terms,
+    postings map each term to the protocols that list it, and an
+    Aho-Corasick automaton finds every keyword in a query in one pass.
+    Matches are ranked with BM25. The compiled index is pickled to
+    `index_dir` keyed by a fingerprint of the keywords, so a restart with
+    unchanged protocols loads it instead of rebuilding.
     """
+
+    _INDEX_FIELDS = ("postings", "doc_lengths", "avg_doc_length", "idf", "automaton")
     
-    def __init__(self):
-        self.protocols = MEDICAL_PROTOCOLS_DB
+    def __init__(
+        self,
+        protocols: Dict[str, Dict[str, Any]],
+        k1: float = 1.2,
+        b: float = 0.75,
+        index_dir: Optional[str] = REFERENCE_INDEX_DIR
+    ):
+        self.protocols = protocols
+        self.k1 = k1
+        self.b = b
+        self.index_dir = index_dir
+        if not self._load_index_snapshot():
+            self._build_index()
+            self._save_index_snapshot()
         print("âœ… Using in-memory protocol database (No Vultr required)")
+
+    def _index_snapshot_path(self) -> Optional[str]:
+        if not self.index_dir:
+            return None
+        keywords = {protocol_id: data["keywords"] for protocol_id, data in self.protocols.items()}
+        fingerprint = hashlib.sha256(
+            json.dumps(["bm25-v1", self.k1, self.b, keywords], sort_keys=True).encode("utf-8")
+        ).hexdigest()[:16]
+        return os.path.join(self.index_dir, f"keyword-{fingerprint}.pkl")
+
+    def _load_index_snapshot(self) -> bool:
+        path = self._index_snapshot_path()
+        if not path or not os.path.exists(path):
+            return False
+        try:
+            with open(path, "rb") as f:
+                snapshot = pickle.load(f)
+            for name in self._INDEX_FIELDS:
+                setattr(self, name, snapshot[name])
+            return True
+        except Exception as e:
+            print(f"Ignoring unreadable keyword index snapshot {path}: {e}")
+            return False
+
+    def _save_index_snapshot(self) -> None:
+        path = self._index_snapshot_path()
+        if not path:
+            return
+        snapshot = {name: getattr(self, name) for name in self._INDEX_FIELDS}
+        try:
+            _write_index_snapshot(path, lambda f: pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL))
+        except OSError as e:
+            print(f"Could not write keyword index snapshot: {e}")
+
+    def _build_index(self) -> None:
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.automaton = AhoCorasick()
+
+        for protocol_id, protocol_data in self.protocols.items():
+            terms = [
+                " ".join(token for token, _, _ in tokenize(keyword))
+                for keyword in protocol_data["keywords"]
+            ]
+            terms = [term for term in terms if term]
+            self.doc_lengths[protocol_id] = len(terms)
+            for term in terms:
+                postings = self.postings.setdefault(term, {})
+                postings[protocol_id] = postings.get(protocol_id, 0) + 1
+
+        for term in self.postings:
+            self.automaton.add(term.split(" "), term)
+        self.automaton.build()
+
+        doc_count = len(self.protocols)
+        self.avg_doc_length = (sum(self.doc_lengths.values()) / doc_count) if doc_count else 0.0
+        self.idf = {
+            term: math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def match_terms(self, text: str) -> Set[str]:
+        """Index terms (protocol keywords) occurring in the text"""
+        tokens = [token for token, _, _ in tokenize(text)]
+        return {term for _, _, term in self.automaton.iter_matches(tokens)}
+
+    def bm25_scores(self, text: str) -> Dict[str, float]:
+        """Raw BM25 score per protocol for the keywords found in the text"""
+        scores: Dict[str, float] = {}
+        for term in self.match_terms(text):
+            idf = self.idf[term]
+            for protocol_id, tf in self.postings[term].items():
+                length_norm = 1 - self.b + self.b * self.doc_lengths[protocol_id] / (self.avg_doc_length or 1)
+                scores[protocol_id] = scores.get(protocol_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+        return scores
+
+    def _result(self, protocol_id: str, score: float) -> Dict[str, Any]:
+        protocol_data = self.protocols[protocol_id]
+        return {
+            "protocol": protocol_data["protocol"],
+            "details": protocol_data["details"],
+            "contraindications": protocol_data["contraindications"],
+            "score": score
+        }
     
     async def search_protocol(self, symptom: str, limit: int = 3) -> List[Dict[str, Any]]:
         """
         Search for EMS protocols matching the symptom description
-        Uses keyword matching instead of vector similarity
+        Uses the keyword index instead of vector similarity
         
         Args:
             symptom: Patient symptom or complaint
             limit: Maximum number of protocols to return
         
         Returns:
-            List of protocol documents with relevance scores
+            List of protocol documents with relevance scores (0-1)
         """
-        symptom_lower = symptom.lower()
-        results = []
-        
-        # Score each protocol based on keyword matches
-        for protocol_id, protocol_data in self.protocols.items():
-            score = 0.0
-            
-            # Check if any keywords match
-            for keyword in protocol_data["keywords"]:
-                if keyword in symptom_lower:
-                    score += 1.0
-            
-            # Normalize score
-            if score > 0:
-                score = min(score / len(protocol_data["keywords"]), 1.0)
-                results.append({
-                    "protocol": protocol_data["protocol"],
-                    "details": protocol_data["details"],
-                    "contraindications": protocol_data["contraindications"],
-                    "score": score
-                })
-        
-        # Sort by score descending
-        results.sort(key=lambda x: x["score"], reverse=True)
+        scores = self.bm25_scores(symptom)
+
+        # Squash unbounded BM25 into 0-1 so callers can keep showing a match percentage
+        ranked = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        results = [self._result(protocol_id, raw / (raw + 1)) for protocol_id, raw in ranked]
         
         # If no matches, return general assessment
-        if not results:
-            general = self.protocols["general_assessment"]
-            results.append({
-                "protocol": general["protocol"],
-                "details": general["details"],
-                "contraindications": general["contraindications"],
-                "score": 0.5
-            })
+        if not results and "general_assessment" in self.protocols:
+            results.append(self._result("general_assessment", 0.5))
         
-        return results[:limit]
+        return results
+
+
+# ============================================================================
+# VECTOR PROTOCOL SEARCH (Local embeddings, optional Qdrant)
+# ============================================================================
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+try:
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models as qdrant_models
+    QDRANT_AVAILABLE = True
+except ImportError:
+    QDRANT_AVAILABLE = False
+
+EMBEDDING_STOPWORDS = {
+    "a", "an", "and", "are", "at", "be", "for", "from", "ha", "has", "have", "he", "her", "his",
+    "in", "is", "it", "of", "on", "or", "she", "that", "the", "their", "they", "to", "wa", "was",
+    "with", "patient"
+}
+
+
+class HashedNgramEmbedder:
+    """
+    CPU-only text embeddings from hashed word, word-bigram and character
+    n-gram features (no model download, deterministic across processes)
+
+    Character n-grams let paraphrases share signal with protocol text,
+    e.g. "can't catch his breath" with "shortness of breath".
+    """
+
+    def __init__(self, dim: int = 512, char_ngrams: Tuple[int, ...] = (3, 4, 5)):
+        self.dim = dim
+        self.char_ngrams = char_ngrams
+
+    @property
+    def fingerprint(self) -> str:
+        return f"hashed-ngram-v1-{self.dim}-{'.'.join(map(str, self.char_ngrams))}"
+
+    def _features(self, text: str) -> Iterator[Tuple[str, float]]:
+        tokens = [token for token, _, _ in tokenize(text) if token not in EMBEDDING_STOPWORDS]
+        for token in tokens:
+            yield f"w:{token}", 1.0
+            padded = f"<{token}>"
+            for n in self.char_ngrams:
+                for i in range(len(padded) - n + 1):
+                    yield f"c:{padded[i:i + n]}", 0.5
+        for first, second in zip(tokens, tokens[1:]):
+            yield f"b:{first} {second}", 1.0
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        """L2-normalized float32 matrix with one row per text"""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                # Signed hashing keeps collisions from only ever adding up
+                matrix[row, value % self.dim] += weight if value >> 63 else -weight
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+class VectorProtocolSearch(InMemoryProtocolSearch):
+    """
+    Protocol search by cosine similarity of local embeddings
+
+    Protocol embeddings live in one NumPy matrix that is saved next to a
+    fingerprint of the embedder and protocol texts, then memory-mapped on
+    later starts so they are not recomputed. Queries are embedded and
+    scored against the matrix in a single batched product.
+    """
+
+    def __init__(
+        self,
+        protocols: Dict[str, Dict[str, Any]],
+        embedder: Optional[HashedNgramEmbedder] = None,
+        cache_dir: Optional[str] = PROTOCOL_EMBEDDING_DIR,
+        min_score: float = PROTOCOL_VECTOR_MIN_SCORE
+    ):
+        super().__init__(protocols)
+        self.embedder = embedder or HashedNgramEmbedder(PROTOCOL_EMBEDDING_DIM)
+        self.cache_dir = cache_dir
+        self.min_score = min_score
+        self.protocol_ids = list(self.protocols)
+        self.matrix = self._load_or_build_matrix()
+        print(f"âœ… Vector protocol search ready ({len(self.protocol_ids)} protocols, dim {self.embedder.dim})")
+
+    @staticmethod
+    def document_text(protocol_data: Dict[str, Any]) -> str:
+        return " ".join([protocol_data["protocol"], *protocol_data["keywords"], protocol_data["details"]])
+
+    def _load_or_build_matrix(self) -> "np.ndarray":
+        texts = [self.document_text(self.protocols[protocol_id]) for protocol_id in self.protocol_ids]
+        if not self.cache_dir:
+            return self.embedder.embed(texts)
+
+        fingerprint = hashlib.sha256(
+            json.dumps([self.embedder.fingerprint, self.protocol_ids, texts]).encode("utf-8")
+        ).hexdigest()[:16]
+        path = os.path.join(self.cache_dir, f"protocols-{fingerprint}.npy")
+        if os.path.exists(path):
+            return np.load(path, mmap_mode="r")
+
+        matrix = self.embedder.embed(texts)
+        _write_index_snapshot(path, lambda f: np.save(f, matrix))
+        return np.load(path, mmap_mode="r")
+
+    def top_k(self, queries: Sequence[str], k: int) -> List[List[Tuple[str, float]]]:
+        """Best k (protocol_id, cosine similarity) pairs for each query"""
+        if not queries or not self.protocol_ids:
+            return [[] for _ in queries]
+        k = min(k, len(self.protocol_ids))
+        similarities = self.embedder.embed(queries) @ self.matrix.T
+        candidates = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        results = []
+        for row, columns in enumerate(candidates):
+            ordered = columns[np.argsort(-similarities[row, columns])]
+            results.append([(self.protocol_ids[column], float(similarities[row, column])) for column in ordered])
+        return results
+
+    async def search_protocol(self, symptom: str, limit: int = 3) -> List[Dict[str, Any]]:
+        """Same contract as the keyword search; scores are cosine similarities"""
+        results = [
+            self._result(protocol_id, score)
+            for protocol_id, score in self.top_k([symptom], limit)[0]
+            if score >= self.min_score
+        ]
+        if not results and "general_assessment" in self.protocols:
+            results.append(self._result("general_assessment", 0.5))
+        return results
+
+
+class QdrantProtocolSearch(VectorProtocolSearch):
+    """Vector protocol search served from a local Qdrant (in-process `:memory:` by default)"""
+
+    collection_name = "ems_protocols"
+
+    def __init__(self, *args: Any, location: str = QDRANT_LOCATION, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.client = QdrantClient(location=location)
+        self.client.recreate_collection(
+            collection_name=self.collection_name,
+            vectors_config=qdrant_models.VectorParams(
+                size=self.embedder.dim,
+                distance=qdrant_models.Distance.COSINE
+            )
+        )
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=[
+                qdrant_models.PointStruct(id=row, vector=self.matrix[row].tolist(), payload={"protocol_id": protocol_id})
+                for row, protocol_id in enumerate(self.protocol_ids)
+            ]
+        )
+        print(f"âœ… Qdrant protocol collection loaded at {location}")
+
+    def top_k(self, queries: Sequence[str], k: int) -> List[List[Tuple[str, float]]]:
+        if not queries:
+            return []
+        responses = self.client.search_batch(
+            collection_name=self.collection_name,
+            requests=[
+                qdrant_models.SearchRequest(vector=vector.tolist(), limit=k, with_payload=True)
+                for vector in self.embedder.embed(queries)
+            ]
+        )
+        return [[(hit.payload["protocol_id"], hit.score) for hit in hits] for hits in responses]
+
+
+class HybridProtocolSearch(VectorProtocolSearch):
+    """
+    Keyword (BM25) and vector rankings fused with reciprocal-rank fusion
+
+    Each protocol scores sum(1 / (rrf_k + rank)) over the rankings it
+    appears in, so a protocol found by both retrievers beats one found by
+    either alone. Scores are divided by the best possible fused score to
+    stay in 0-1. A protocol enters the vector ranking only if a keyword
+    matched it or its cosine similarity reaches `min_score`.
+    """
+
+    def __init__(self, *args: Any, rrf_k: int = PROTOCOL_RRF_K, candidates: int = 10, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.rrf_k = rrf_k
+        self.candidates = candidates
+
+    def fused_scores(self, symptom: str) -> Dict[str, float]:
+        keyword_scores = self.bm25_scores(symptom)
+        rankings = [
+            heapq.nlargest(self.candidates, keyword_scores, key=keyword_scores.get),
+            [
+                protocol_id for protocol_id, score in self.top_k([symptom], self.candidates)[0]
+                if score >= self.min_score or (protocol_id in keyword_scores and score > 0)
+            ]
+        ]
+        fused: Dict[str, float] = {}
+        for ranking in rankings:
+            for rank, protocol_id in enumerate(ranking, start=1):
+                fused[protocol_id] = fused.get(protocol_id, 0.0) + 1.0 / (self.rrf_k + rank)
+        return fused
+
+    async def search_protocol(self, symptom: str, limit: int = 3) -> List[Dict[str, Any]]:
+        fused = self.fused_scores(symptom)
+        best_possible = 2.0 / (self.rrf_k + 1)
+        results = [
+            self._result(protocol_id, score / best_possible)
+            for protocol_id, score in heapq.nlargest(limit, fused.items(), key=lambda item: item[1])
+        ]
+        if not results and "general_assessment" in self.protocols:
+            results.append(self._result("general_assessment", 0.5))
+        return results
+
+
+class CachedProtocolSearch:
+    """
+    LRU cache of normalized query -> top-k results in front of a protocol search
+
+    Medics repeat the same handful of complaints, so "Chest pains!" and
+    "chest pain" share one entry. Hit rate and retrieval latency are
+    published to /metrics.
+    """
+
+    def __init__(self, backend: InMemoryProtocolSearch, max_entries: int = PROTOCOL_QUERY_CACHE_SIZE):
+        self.backend = backend
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int], List[Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        metrics.register_gauge("protocol_search.cache_hit_rate", self.hit_rate)
+        metrics.register_gauge("protocol_search.cache_entries", lambda: len(self._entries))
+
+    @staticmethod
+    def normalize_query(symptom: str) -> str:
+        return " ".join(token for token, _, _ in tokenize(symptom))
+
+    def hit_rate(self) -> Optional[float]:
+        lookups = self.hits + self.misses
+        return round(self.hits / lookups, 4) if lookups else None
+
+    def replace_backend(self, backend: InMemoryProtocolSearch) -> None:
+        """Swap in a freshly built index; cached results from the old one are dropped"""
+        self.backend = backend
+        self._entries = OrderedDict()
+
+    async def search_protocol(self, symptom: str, limit: int = 3) -> List[Dict[str, Any]]:
+        key = (self.normalize_query(symptom), limit)
+        with metrics.timer("protocol_search.latency_ms"):
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.incr("protocol_search.cache_hits")
+            else:
+                self.misses += 1
+                metrics.incr("protocol_search.cache_misses")
+                with metrics.timer("protocol_search.retrieval_ms"):
+                    cached = await self.backend.search_protocol(symptom, limit)
+                if self.max_entries > 0:
+                    self._entries[key] = cached
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        # Callers get their own dicts so they cannot corrupt cached entries
+        return [dict(result) for result in cached]
+
+
+def build_protocol_search(protocols: Dict[str, Dict[str, Any]]) -> InMemoryProtocolSearch:
+    """Create the configured protocol search backend, degrading to keywords if deps are missing"""
+    backend = PROTOCOL_SEARCH_BACKEND
+    if backend not in ("hybrid", "keyword", "vector", "qdrant"):
+        raise ValueError(f"Unknown PROTOCOL_SEARCH_BACKEND: {PROTOCOL_SEARCH_BACKEND}")
+    if backend != "keyword" and not NUMPY_AVAILABLE:
+        print("numpy not installed, falling back to keyword protocol search")
+        backend = "keyword"
+    if backend == "qdrant" and not QDRANT_AVAILABLE:
+        print("qdrant-client not installed, falling back to NumPy vector protocol search")
+        backend = "vector"
+
+    if backend == "hybrid":
+        return HybridProtocolSearch(protocols)
+    if backend == "qdrant":
+        return QdrantProtocolSearch(protocols)
+    if backend == "vector":
+        return VectorProtocolSearch(protocols)
+    return InMemoryProtocolSearch(protocols)
 
 
 # ============================================================================
 # DRUG INTERACTION CHECKER
 # ============================================================================
+SEVERITY_RANK = {"LOW": 0, "MODERATE": 1, "HIGH": 2, "CRITICAL": 3}
+
+
+def medication_name(entry: Union[str, Dict[str, Any]]) -> str:
+    """Administered medications are logged as {"medication", "timestamp"} dicts or plain strings"""
+    if isinstance(entry, dict):
+        return str(entry.get("medication", ""))
+    return entry
+
+
+def risk_severity(risk: str) -> str:
+    """'CRITICAL - Increased bleeding risk' -> 'CRITICAL'"""
+    severity = risk.split(" - ", 1)[0].strip().upper()
+    return severity if severity in SEVERITY_RANK else "MODERATE"
+
+
+def _single_deletes(word: str) -> Set[str]:
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """True if a and b differ by at most one insert, delete, substitution or adjacent swap"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(diffs) == 1:
+            return True
+        return len(diffs) == 2 and diffs[1] == diffs[0] + 1 and a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]]
+    shorter, longer = (a, b) if len(a) < len(b) else (b, a)
+    return any(longer[:i] + longer[i + 1:] == shorter for i in range(len(longer)))
+
+
+class DrugNameNormalizer:
+    """
+    Maps free-text medication entries ("Coumadin 5mg daily", "asprin 324")
+    to canonical drug IDs plus the drug classes they belong to
+
+    Exact names, brand names and listed misspellings are found in one pass
+    with the token Aho-Corasick automaton; remaining long tokens get a
+    one-edit fuzzy match through a symmetric-delete index.
+    """
+
+    FUZZY_MIN_LENGTH = 5
+
+    def __init__(
+        self,
+        canonical_ids: Sequence[str],
+        synonyms: Optional[Dict[str, List[str]]] = None,
+        classes: Optional[Dict[str, List[str]]] = None
+    ):
+        self._aliases: Dict[str, str] = {}
+        self._classes_of: Dict[str, Set[str]] = {}
+        for canonical_id in canonical_ids:
+            self._add_alias(canonical_id, canonical_id)
+        for class_id, members in (classes or {}).items():
+            self._add_alias(class_id, class_id)
+            for member in members:
+                self._add_alias(member, member)
+                self._classes_of.setdefault(member, set()).add(class_id)
+        for canonical_id, names in (synonyms or {}).items():
+            self._add_alias(canonical_id, canonical_id)
+            for name in names:
+                self._add_alias(name, canonical_id)
+
+        self.automaton = AhoCorasick()
+        self._deletes: Dict[str, Set[str]] = {}
+        for alias in self._aliases:
+            self.automaton.add(alias.split(" "), alias)
+            if " " not in alias and len(alias) >= self.FUZZY_MIN_LENGTH:
+                for variant in _single_deletes(alias) | {alias}:
+                    self._deletes.setdefault(variant, set()).add(alias)
+        self.automaton.build()
+
+    @staticmethod
+    def phrase(text: str) -> str:
+        return " ".join(token for token, _, _ in tokenize(text))
+
+    def _add_alias(self, name: str, canonical_id: str) -> None:
+        alias = self.phrase(name)
+        if alias:
+            self._aliases.setdefault(alias, canonical_id)
+
+    def canonical_id(self, name: str) -> str:
+        """Canonical ID for an exact drug/class/brand name (the name itself if unknown)"""
+        alias = self.phrase(name)
+        return self._aliases.get(alias, alias)
+
+    def _fuzzy(self, token: str) -> Optional[str]:
+        candidates: Set[str] = set()
+        for variant in _single_deletes(token) | {token}:
+            candidates |= self._deletes.get(variant, set())
+        matches = {self._aliases[alias] for alias in candidates if _within_one_edit(token, alias)}
+        # Ambiguous typos are not guessed at
+        return matches.pop() if len(matches) == 1 else None
+
+    def normalize(self, medication: str) -> Set[str]:
+        tokens = [token for token, _, _ in tokenize(medication)]
+        ids: Set[str] = set()
+        covered: Set[int] = set()
+        for start, end, alias in self.automaton.iter_matches(tokens):
+            ids.add(self._aliases[alias])
+            covered.update(range(start, end))
+        for position, token in enumerate(tokens):
+            if position not in covered and len(token) >= self.FUZZY_MIN_LENGTH and token.isalpha():
+                fuzzy_id = self._fuzzy(token)
+                if fuzzy_id:
+                    ids.add(fuzzy_id)
+        for canonical_id in list(ids):
+            ids |= self._classes_of.get(canonical_id, set())
+        return ids
+
+    def mentions(self, text: str) -> List[Tuple[str, int, int]]:
+        """Known drug/class/brand names in free text as (name as written, start, end); no fuzzy matching"""
+        tokens = tokenize(text)
+        return [
+            (text[tokens[start][1]:tokens[end - 1][2]], tokens[start][1], tokens[end - 1][2])
+            for start, end, _ in self.automaton.iter_matches([token for token, _, _ in tokens])
+        ]
+
+
+class DrugInteractionGraph:
+    """
+    Symmetric interaction graph over canonical drug and class IDs
+
+    Built once per reference data version. Each listed interaction becomes
+    an undirected edge (the more severe record wins when both directions are
+    listed), so checking a session is a few hash probes per medication
+    instead of a scan of the whole interaction table.
+    """
+
+    def __init__(
+        self,
+        interactions: Dict[str, Dict[str, Any]],
+        synonyms: Optional[Dict[str, List[str]]] = None,
+        classes: Optional[Dict[str, List[str]]] = None
+    ):
+        self.normalizer = DrugNameNormalizer(list(interactions), synonyms, classes)
+        self.edges: Dict[FrozenSet[str], Dict[str, str]] = {}
+        self.adjacency: Dict[str, Set[str]] = {}
+        for drug, data in interactions.items():
+            record = {
+                "risk": data["risk"],
+                "recommendation": data["recommendation"],
+                "severity": risk_severity(data["risk"])
+            }
+            drug_id = self.normalizer.canonical_id(drug)
+            for other in data["interacts_with"]:
+                self._add_edge(drug_id, self.normalizer.canonical_id(other), record)
+
+    def _add_edge(self, a: str, b: str, record: Dict[str, str]) -> None:
+        key = frozenset((a, b))
+        existing = self.edges.get(key)
+        if existing is None or SEVERITY_RANK[record["severity"]] > SEVERITY_RANK[existing["severity"]]:
+            self.edges[key] = record
+        self.adjacency.setdefault(a, set()).add(b)
+        self.adjacency.setdefault(b, set()).add(a)
+
+    def interactions_between(
+        self,
+        medications: Sequence[Union[str, Dict[str, Any]]],
+        other_medications: Sequence[Union[str, Dict[str, Any]]]
+    ) -> List[Dict[str, str]]:
+        """One warning per interacting (medication, other medication) pair, most severe edge first"""
+        other_index: Dict[str, List[str]] = {}
+        for entry in other_medications:
+            name = medication_name(entry)
+            for canonical_id in self.normalizer.normalize(name):
+                other_index.setdefault(canonical_id, []).append(name)
+
+        found: Dict[Tuple[str, str], Dict[str, str]] = {}
+        for entry in medications:
+            name = medication_name(entry)
+            for canonical_id in self.normalizer.normalize(name):
+                for neighbour in self.adjacency.get(canonical_id, ()):
+                    record = self.edges[frozenset((canonical_id, neighbour))]
+                    for other_name in other_index.get(neighbour, ()):
+                        existing = found.get((name, other_name))
+                        if existing is None or SEVERITY_RANK[record["severity"]] > SEVERITY_RANK[existing["severity"]]:
+                            found[(name, other_name)] = record
+
+        return [
+            {
+                "drug1": drug1,
+                "drug2": drug2,
+                "risk": record["risk"],
+                "recommendation": record["recommendation"],
+                "severity": record["severity"]
+            }
+            for (drug1, drug2), record in found.items()
+        ]
+
+
+@dataclass
+class _SessionInteractions:
+    """Materialized interaction warnings for one session"""
+    graph: DrugInteractionGraph
+    current_medications: Tuple[str, ...]
+    administered_count: int
+    warnings: List[Dict[str, str]]
+    pairs: Set[Tuple[str, str]]
+
+
+class SessionInteractionCache:
+    """
+    Per-session set of active drug interaction warnings, kept up to date
+    incrementally
+
+    Administered medications are append-only, so when a medication is
+    logged only the new entries are checked against the patient's current
+    medications. The full check reruns only when the current medication
+    list or the reference data version changes.
+    """
+
+    def __init__(self, max_sessions: int = 4096):
+        self.max_sessions = max_sessions
+        self._entries: "OrderedDict[str, _SessionInteractions]" = OrderedDict()
+
+    def refresh(self, session: SessionContext) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+        """Bring a session's warnings up to date; returns (all warnings, newly found warnings)"""
+        graph = reference_data.current.interaction_graph
+        current = tuple(session.patient_history.current_medications)
+        administered = session.administered_medications
+        entry = self._entries.get(session.session_id)
+
+        if (
+            entry is None
+            or entry.graph is not graph
+            or entry.current_medications != current
+            or entry.administered_count > len(administered)
+        ):
+            metrics.incr("interactions.full_checks")
+            warnings = graph.interactions_between(administered, current)
+            entry = _SessionInteractions(
+                graph=graph,
+                current_medications=current,
+                administered_count=len(administered),
+                warnings=warnings,
+                pairs={(w["drug1"], w["drug2"]) for w in warnings}
+            )
+            self._entries[session.session_id] = entry
+            new_warnings = warnings
+        elif entry.administered_count < len(administered):
+            metrics.incr("interactions.incremental_checks")
+            new_warnings = [
+                warning
+                for warning in graph.interactions_between(administered[entry.administered_count:], current)
+                if (warning["drug1"], warning["drug2"]) not in entry.pairs
+            ]
+            entry.warnings.extend(new_warnings)
+            entry.pairs.update((w["drug1"], w["drug2"]) for w in new_warnings)
+            entry.administered_count = len(administered)
+        else:
+            metrics.incr("interactions.cache_hits")
+            new_warnings = []
+
+        self._entries.move_to_end(session.session_id)
+        while len(self._entries) > self.max_sessions:
+            self._entries.popitem(last=False)
+        return list(entry.warnings), new_warnings
+
+
+session_interactions = SessionInteractionCache()
+
+
 def check_drug_interactions(
     current_medications: List[str],
-    administered_medications: List[str]
+    administered_medications: List[Union[str, Dict[str, Any]]]
 ) -> List[Dict[str, str]]:
     """
     Check for drug interactions between current and administered medications
@@ -440,113 +2075,1130 @@ def check_drug_interactions(
     Returns:
         List of interaction warnings
     """
-    warnings = []
-    
-    for admin_med in administered_medications:
-        admin_med_lower = admin_med.lower()
-        
-        # Check if administered medication is in our database
-        for drug_name, drug_data in DRUG_INTERACTIONS_DB.items():
-            if drug_name in admin_med_lower:
-                # Check against current medications
-                for current_med in current_medications:
-                    current_med_lower = current_med.lower()
-                    
-                    for interacting_drug in drug_data["interacts_with"]:
-                        if interacting_drug in current_med_lower:
-                            warnings.append({
-                                "drug1": admin_med,
-                                "drug2": current_med,
-                                "risk": drug_data["risk"],
-                                "recommendation": drug_data["recommendation"]
-                            })
-    
-    return warnings
+    return reference_data.current.interaction_graph.interactions_between(
+        administered_medications,
+        current_medications
+    )
+
+
+# ============================================================================
+# REFERENCE DATA (File-backed, hot reloadable)
+# ============================================================================
+# name -> (file in REFERENCE_DATA_DIR, key holding the data in that file)
+REFERENCE_DATA_FILES = {
+    "protocols": ("protocols.json", "protocols"),
+    "drug_interactions": ("drug_interactions.json", "interactions"),
+    "hospitals": ("hospitals.json", "hospitals")
+}
+PROTOCOL_REQUIRED_FIELDS = ("protocol", "details", "contraindications", "keywords")
+
+
+@dataclass
+class ReferenceData:
+    """One consistent, fully indexed version of the reference databases"""
+    protocols: Dict[str, Dict[str, Any]]
+    drug_interactions: Dict[str, Dict[str, Any]]
+    hospitals: List[Dict[str, Any]]
+    versions: Dict[str, str]
+    protocol_search: InMemoryProtocolSearch
+    interaction_graph: DrugInteractionGraph
+    loaded_at: str
+
+
+class ReferenceDataStore:
+    """
+    Loads protocols, drug interactions and hospitals from versioned data files
+
+    A watcher polls the files; when one changes the new version is parsed
+    and indexed on a worker thread while requests keep using the current
+    one, then swapped in with a single reference assignment. A file that
+    fails to parse or validate is logged and the previous version stays live.
+    """
+
+    def __init__(self, data_dir: str, poll_interval: float = 2.0):
+        self.data_dir = data_dir
+        self.poll_interval = poll_interval
+        self._listeners: List[Callable[[ReferenceData], None]] = []
+        self._stamps = self._file_stamps()
+        self.current = self._load()
+        metrics.register_gauge("reference_data.versions", lambda: dict(self.current.versions))
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.data_dir, REFERENCE_DATA_FILES[name][0])
+
+    def _file_stamps(self) -> Dict[str, Optional[Tuple[int, int]]]:
+        stamps: Dict[str, Optional[Tuple[int, int]]] = {}
+        for name in REFERENCE_DATA_FILES:
+            try:
+                stat = os.stat(self._path(name))
+                stamps[name] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                stamps[name] = None
+        return stamps
+
+    def _read(self, name: str) -> Dict[str, Any]:
+        filename, key = REFERENCE_DATA_FILES[name]
+        with open(self._path(name), "r", encoding="utf-8") as f:
+            document = json.load(f)
+        if key not in document:
+            raise ValueError(f"{filename} has no '{key}' section")
+        return document
+
+    def _load(self) -> ReferenceData:
+        documents = {name: self._read(name) for name in REFERENCE_DATA_FILES}
+        versions = {name: str(document.get("version", "unversioned")) for name, document in documents.items()}
+        sections = {name: documents[name][key] for name, (_, key) in REFERENCE_DATA_FILES.items()}
+
+        for protocol_id, protocol in sections["protocols"].items():
+            missing = [field_name for field_name in PROTOCOL_REQUIRED_FIELDS if field_name not in protocol]
+            if missing:
+                raise ValueError(f"Protocol '{protocol_id}' is missing {', '.join(missing)}")
+
+        return ReferenceData(
+            protocols=sections["protocols"],
+            drug_interactions=sections["drug_interactions"],
+            hospitals=sections["hospitals"],
+            versions=versions,
+            protocol_search=build_protocol_search(sections["protocols"]),
+            interaction_graph=DrugInteractionGraph(
+                sections["drug_interactions"],
+                synonyms=documents["drug_interactions"].get("synonyms"),
+                classes=documents["drug_interactions"].get("classes")
+            ),
+            loaded_at=datetime.utcnow().isoformat()
+        )
+
+    def subscribe(self, listener: Callable[[ReferenceData], None]) -> None:
+        """Call `listener` with each newly swapped-in version"""
+        self._listeners.append(listener)
+
+    async def reload(self) -> bool:
+        stamps = self._file_stamps()
+        loop = asyncio.get_running_loop()
+        try:
+            with metrics.timer("reference_data.reload_ms"):
+                data = await loop.run_in_executor(None, self._load)
+        except Exception as e:
+            # Remember the broken stamps so we only retry once the file changes again
+            self._stamps = stamps
+            metrics.incr("reference_data.reload_errors")
+            print(f"Reference data reload failed, keeping previous version: {e}")
+            return False
+
+        self._stamps = stamps
+        self.current = data
+        for listener in self._listeners:
+            listener(data)
+        metrics.incr("reference_data.reloads")
+        print(f"Reference data reloaded: {data.versions}")
+        return True
+
+    async def run_watcher(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if self._file_stamps() != self._stamps:
+                await self.reload()
+
+
+# ============================================================================
+# UPSTREAM HTTP CLIENTS - Shared Connection Pools
+# ============================================================================
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class UpstreamClientRegistry:
+    """
+    One pooled httpx.AsyncClient per upstream (Cerebras, ElevenLabs)
+
+    Clients are opened at app startup and closed at shutdown, so TCP/TLS
+    connections are reused across requests instead of being re-established
+    for every LLM or TTS call. HTTP/2 is used when the `h2` package is
+    installed.
+    """
+
+    def __init__(self):
+        self._configs: Dict[str, Dict[str, Any]] = {}
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def register(self, name: str, headers: Dict[str, str], max_connections: int) -> None:
+        self._configs[name] = {"headers": headers, "max_connections": max_connections}
+
+    def _open(self, name: str) -> httpx.AsyncClient:
+        config = self._configs[name]
+        return httpx.AsyncClient(
+            headers=config["headers"],
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=config["max_connections"],
+                max_keepalive_connections=config["max_connections"],
+                keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY
+            )
+        )
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._open(name)
+        return client
+
+    def start(self) -> None:
+        for name in self._configs:
+            self.get(name)
+
+    async def aclose(self) -> None:
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+
+upstream_clients = UpstreamClientRegistry()
+upstream_clients.register(
+    "cerebras",
+    headers={"Authorization": f"Bearer {CEREBRAS_API_KEY}", "Content-Type": "application/json"},
+    max_connections=CEREBRAS_MAX_CONNECTIONS
+)
+upstream_clients.register(
+    "elevenlabs",
+    headers={"xi-api-key": ELEVENLABS_API_KEY, "Content-Type": "application/json"},
+    max_connections=ELEVENLABS_MAX_CONNECTIONS
+)
+
+
+class UpstreamUnavailableError(Exception):
+    """Raised instead of calling an upstream that is rate limited, saturated or tripped"""
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`; each call takes one"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def tokens(self) -> float:
+        self._refill()
+        return self._tokens
+
+    async def acquire(self, timeout: float) -> bool:
+        """Take a token, waiting up to `timeout` seconds for one to refill"""
+        deadline = time.monotonic() + timeout
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            wait = (1 - self._tokens) / self.rate if self.rate > 0 else timeout
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+
+    closed: calls flow. After `failure_threshold` failures in a row it opens
+    and every call is refused until `reset_timeout` has passed; then it is
+    half-open and lets a single probe through. The probe's outcome closes
+    the breaker again or re-opens it for another cooldown.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probe_in_flight or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def record_ignored(self) -> None:
+        """The call ended without saying anything about upstream health"""
+        self._probe_in_flight = False
+
+
+class UpstreamGuard:
+    """
+    Admission control in front of one upstream
+
+    A call passes the circuit breaker (refused at once while open), takes
+    a token-bucket token and then a concurrency slot. Waiting for the token
+    and the slot together is bounded by `queue_timeout`, so under overload
+    callers fail fast with UpstreamUnavailableError and use their local
+    fallback instead of queueing behind a slow API. Timeouts, transport
+    errors, 5xx, 429 and auth errors count as breaker failures.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: int,
+        max_concurrency: int,
+        queue_timeout: float = UPSTREAM_QUEUE_TIMEOUT,
+        failure_threshold: int = UPSTREAM_BREAKER_FAILURES,
+        reset_timeout: float = UPSTREAM_BREAKER_RESET_TIMEOUT
+    ):
+        self.name = name
+        self.queue_timeout = queue_timeout
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.queued = 0
+        self.in_flight = 0
+        prefix = f"upstream.{name}"
+        metrics.register_gauge(f"{prefix}.breaker_state", lambda: self.breaker.state)
+        metrics.register_gauge(f"{prefix}.queue_depth", lambda: self.queued)
+        metrics.register_gauge(f"{prefix}.in_flight", lambda: self.in_flight)
+        metrics.register_gauge(f"{prefix}.tokens_available", lambda: round(self.bucket.tokens, 2))
+
+    def available(self) -> bool:
+        """False while the breaker is open, i.e. calls would be refused outright"""
+        return self.breaker.state != CircuitBreaker.OPEN
+
+    def _reject(self, reason: str) -> UpstreamUnavailableError:
+        metrics.incr(f"upstream.{self.name}.rejected.{reason}")
+        return UpstreamUnavailableError(f"{self.name} unavailable: {reason}")
+
+    async def acquire(self) -> None:
+        if not self.breaker.allow():
+            raise self._reject("breaker_open")
+        deadline = time.monotonic() + self.queue_timeout
+        self.queued += 1
+        try:
+            if not await self.bucket.acquire(self.queue_timeout):
+                self.breaker.record_ignored()
+                raise self._reject("rate_limited")
+            try:
+                await asyncio.wait_for(self._slots.acquire(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                self.breaker.record_ignored()
+                raise self._reject("queue_timeout")
+        except asyncio.CancelledError:
+            self.breaker.record_ignored()
+            raise
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+
+    def release(self, error: Optional[BaseException] = None) -> None:
+        self.in_flight -= 1
+        self._slots.release()
+        if error is None:
+            self.breaker.record_success()
+        elif self._is_upstream_failure(error):
+            metrics.incr(f"upstream.{self.name}.failures")
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_ignored()
+
+    @staticmethod
+    def _is_upstream_failure(error: BaseException) -> bool:
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            return status >= 500 or status in (401, 403, 429)
+        return isinstance(error, httpx.TransportError)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold an admitted slot for the duration of one upstream call"""
+        await self.acquire()
+        try:
+            yield
+        except BaseException as e:
+            self.release(e)
+            raise
+        self.release()
+
+
+upstream_guards: Dict[str, UpstreamGuard] = {
+    "cerebras": UpstreamGuard("cerebras", CEREBRAS_RATE_LIMIT, CEREBRAS_RATE_BURST, CEREBRAS_MAX_CONCURRENCY),
+    "elevenlabs": UpstreamGuard("elevenlabs", ELEVENLABS_RATE_LIMIT, ELEVENLABS_RATE_BURST, ELEVENLABS_MAX_CONCURRENCY)
+}
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one execution
+
+    The first caller starts the work as its own task; callers arriving
+    while it is in flight await the same task (shielded, so one caller
+    being cancelled doesn't cancel the others) and get the same result or
+    exception. Waiters are counted: when the last one leaves (cancelled by
+    a deadline or a winning hedge) the work itself is cancelled, so an
+    abandoned call doesn't keep holding its upstream slot. The key is
+    forgotten as soon as the work finishes or is abandoned.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.coalesced = 0
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._waiters: Dict[asyncio.Future, int] = {}
+        metrics.register_gauge(f"{name}.coalescing_ratio", self.coalescing_ratio)
+        metrics.register_gauge(f"{name}.in_flight", lambda: len(self._in_flight))
+
+    def coalescing_ratio(self) -> Optional[float]:
+        """Share of calls that were served by another caller's upstream request"""
+        return round(self.coalesced / self.calls, 4) if self.calls else None
+
+    def _finished(self, key: str, future: asyncio.Future) -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        self._waiters.pop(future, None)
+        if not future.cancelled():
+            # Mark the exception retrieved even if every caller went away
+            future.exception()
+
+    async def do(self, key: str, work: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        metrics.incr(f"{self.name}.calls")
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(work())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.coalesced += 1
+            metrics.incr(f"{self.name}.coalesced")
+        self._waiters[future] = self._waiters.get(future, 0) + 1
+        try:
+            return await asyncio.shield(future)
+        finally:
+            waiters = self._waiters.get(future, 0) - 1
+            if waiters > 0:
+                self._waiters[future] = waiters
+            else:
+                self._waiters.pop(future, None)
+                if not future.done():
+                    # Nobody wants the answer any more; new callers start afresh
+                    if self._in_flight.get(key) is future:
+                        del self._in_flight[key]
+                    future.cancel()
+                    metrics.incr(f"{self.name}.abandoned")
+
+
+cerebras_single_flight = SingleFlight("upstream.cerebras.single_flight")
+
+
+async def call_cerebras(
+    messages: List[Dict[str, str]],
+    purpose: str,
+    temperature: float = 0.1,
+    max_tokens: Optional[int] = None
+) -> str:
+    """
+    Run a chat completion on the shared Cerebras client
+
+    Args:
+        messages: Chat messages (system/user)
+        purpose: Call site name, selects the timeout from CEREBRAS_TIMEOUTS
+        temperature: Sampling temperature
+        max_tokens: Optional completion length cap
+
+    Returns:
+        The stripped completion text (raises httpx errors on failure)
+
+    Identical concurrent requests (same purpose and payload) share one
+    upstream call. Calls pass the Cerebras UpstreamGuard and raise
+    UpstreamUnavailableError when it refuses them.
+    """
+    payload = _completion_payload(messages, temperature, max_tokens)
+    key = hashlib.sha256(json.dumps([purpose, payload], sort_keys=True).encode("utf-8")).hexdigest()
+    return await cerebras_single_flight.do(key, lambda: _post_cerebras(payload, purpose))
+
+
+def _completion_payload(
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: Optional[int]
+) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {
+        "model": CEREBRAS_MODEL,
+        "messages": messages,
+        "temperature": temperature
+    }
+    if max_tokens is not None:
+        payload["max_tokens"] = max_tokens
+    return payload
+
+
+def cerebras_hedge_delay_ms(purpose: str) -> Optional[float]:
+    """p95 latency of recent `purpose` calls, or None until there are enough samples"""
+    if not LLM_HEDGE_ENABLED:
+        return None
+    histogram = metrics.histograms.get(f"upstream.cerebras.{purpose}_ms")
+    if histogram is None or histogram.count < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return max(LLM_HEDGE_MIN_DELAY_MS, histogram.percentile(95))
+
+
+async def call_cerebras_within(
+    messages: List[Dict[str, str]],
+    purpose: str,
+    timeout: float,
+    temperature: float = 0.1,
+    max_tokens: Optional[int] = None
+) -> Tuple[str, str]:
+    """
+    call_cerebras bounded by a deadline, with a hedged duplicate request
+
+    If the call is still outstanding after the purpose's p95 latency, a
+    second identical request is sent (bypassing single-flight, still
+    through the upstream guard) and whichever answers first wins; the
+    other is cancelled.
+
+    Returns:
+        (completion text, path) where path is "llm" or "llm_hedged".
+        Raises asyncio.TimeoutError if nothing answered within `timeout`
+        seconds, or the error of the last request to fail.
+    """
+    start = time.perf_counter()
+    deadline = start + max(0.0, timeout)
+    delay_ms = cerebras_hedge_delay_ms(purpose)
+    hedge_at = None if delay_ms is None else start + delay_ms / 1000
+    pending: Dict[asyncio.Future, str] = {
+        asyncio.ensure_future(call_cerebras(messages, purpose, temperature, max_tokens)): "llm"
+    }
+    try:
+        while pending:
+            now = time.perf_counter()
+            if now >= deadline:
+                metrics.incr(f"upstream.cerebras.{purpose}.deadline_exceeded")
+                raise asyncio.TimeoutError(f"Cerebras {purpose} call missed its {timeout * 1000:.0f}ms deadline")
+            wake = deadline if hedge_at is None else min(deadline, hedge_at)
+            done, _ = await asyncio.wait(pending, timeout=max(0.0, wake - now), return_when=asyncio.FIRST_COMPLETED)
+            error: Optional[BaseException] = None
+            for task in done:
+                path = pending.pop(task)
+                if task.exception() is None:
+                    metrics.incr(f"upstream.cerebras.{purpose}.{path}_won")
+                    return task.result(), path
+                error = task.exception()
+            if not pending and error is not None:
+                raise error
+            if hedge_at is not None and time.perf_counter() >= hedge_at:
+                hedge_at = None
+                metrics.incr(f"upstream.cerebras.{purpose}.hedges_sent")
+                payload = _completion_payload(messages, temperature, max_tokens)
+                pending[asyncio.ensure_future(_post_cerebras(payload, purpose))] = "llm_hedged"
+    finally:
+        for task in pending:
+            task.cancel()
+            # Losers' errors (cancellation, guard refusals) are expected
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+
+async def _post_cerebras(payload: Dict[str, Any], purpose: str) -> str:
+    client = upstream_clients.get("cerebras")
+    async with upstream_guards["cerebras"].slot():
+        with metrics.timer(f"upstream.cerebras.{purpose}_ms"):
+            response = await client.post(CEREBRAS_API_URL, json=payload, timeout=CEREBRAS_TIMEOUTS[purpose])
+        response.raise_for_status()
+    return response.json()["choices"][0]["message"]["content"].strip()
+
+
+async def stream_cerebras(
+    messages: List[Dict[str, str]],
+    purpose: str,
+    temperature: float = 0.1,
+    max_tokens: Optional[int] = None
+) -> AsyncIterator[str]:
+    """
+    Streaming variant of call_cerebras: yields completion tokens as they arrive
+    (Cerebras `stream: true`, OpenAI-style `data:` lines)
+    """
+    payload: Dict[str, Any] = {
+        "model": CEREBRAS_MODEL,
+        "messages": messages,
+        "temperature": temperature,
+        "stream": True
+    }
+    if max_tokens is not None:
+        payload["max_tokens"] = max_tokens
+
+    client = upstream_clients.get("cerebras")
+    start = time.perf_counter()
+    first_token = True
+    async with upstream_guards["cerebras"].slot():
+        async with client.stream("POST", CEREBRAS_API_URL, json=payload, timeout=CEREBRAS_TIMEOUTS[purpose]) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                token = (choices[0].get("delta") or {}).get("content")
+                if token:
+                    if first_token:
+                        metrics.observe(f"upstream.cerebras.{purpose}_first_token_ms", (time.perf_counter() - start) * 1000)
+                        first_token = False
+                    yield token
+    metrics.observe(f"upstream.cerebras.{purpose}_ms", (time.perf_counter() - start) * 1000)
+
+
+async def stream_text(text: str) -> AsyncIterator[str]:
+    """Stream a locally produced answer word by word, like an LLM would"""
+    words = text.split(" ")
+    for index, word in enumerate(words):
+        yield word if index == len(words) - 1 else word + " "
+        await asyncio.sleep(0)
+
+
+def _sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+def sse_response(tokens: AsyncIterator[str], final_fields: Optional[Dict[str, Any]] = None) -> StreamingResponse:
+    """
+    Relay tokens as Server-Sent Events
+
+    Each token is sent as `data: {"token": ...}`; the stream ends with an
+    `event: done` carrying the full text (plus `final_fields`), or an
+    `event: error` if the source fails part-way.
+    """
+    async def events() -> AsyncIterator[str]:
+        parts: List[str] = []
+        try:
+            async for token in tokens:
+                parts.append(token)
+                yield _sse_event({"token": token})
+        except Exception as e:
+            print(f"SSE stream failed: {str(e)}")
+            yield _sse_event({"error": "Stream interrupted", "text": "".join(parts)}, event="error")
+            return
+        yield _sse_event({"text": "".join(parts), **(final_fields or {})}, event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 # ============================================================================
 # CEREBRAS INTEGRATION - Ultra-Low Latency Medical Risk Analysis
 # ============================================================================
+# Local keyword fallback used when Cerebras is not configured
+RISK_KEYWORDS = {
+    "shock": "Possible shock detected",
+    "hypotension": "Hypotension detected",
+    "dropping": "Unstable vitals detected",
+    "bleeding": "Active hemorrhage detected",
+    "unconscious": "Altered mental status detected",
+    "seizure": "Seizure activity detected",
+    "difficulty breathing": "Respiratory distress detected",
+    "chest pain": "Cardiac event detected",
+    "tachycardia": "High heart rate detected",
+    "bradycardia": "Low heart rate detected",
+    "desaturation": "Low oxygen saturation detected",
+    "hypoxia": "Hypoxia detected",
+    "stroke": "Possible stroke symptoms",
+    "slurred": "Neurological deficit detected",
+    "diaphoretic": "Sign of distress detected",
+    "pale": "Sign of shock/distress detected"
+}
+RISK_KEYWORD_SEVERITY = {
+    "shock": "CRITICAL",
+    "hypotension": "HIGH",
+    "dropping": "HIGH",
+    "bleeding": "HIGH",
+    "unconscious": "CRITICAL",
+    "seizure": "HIGH",
+    "difficulty breathing": "CRITICAL",
+    "chest pain": "HIGH",
+    "tachycardia": "MODERATE",
+    "bradycardia": "MODERATE",
+    "desaturation": "HIGH",
+    "hypoxia": "HIGH",
+    "stroke": "CRITICAL",
+    "slurred": "HIGH",
+    "diaphoretic": "MODERATE",
+    "pale": "MODERATE"
+}
+# Pre-negation cues ("no chest pain", "denies bleeding"). A cue negates only
+# the term right after it (optionally past a filler such as "any" or "signs
+# of") and terms chained to that one by "or"/"nor" ("and" often starts an
+# affirmed finding: "no chest pain and bleeding heavily"); commas, clause
+# punctuation and the terminators below end its scope.
+NEGATION_TRIGGERS = [
+    "no", "not", "denies", "denied", "deny", "without", "negative for", "absent", "free of",
+    "never", "isn't", "doesn't", "didn't", "wasn't", "hasn't"
+]
+NEGATION_FILLERS = ["any", "signs of", "evidence of", "history of", "complaints of", "further"]
+NEGATION_CONJUNCTIONS = {"or", "nor"}
+NEGATION_TERMINATORS = [
+    "but", "however", "although", "though", "except", "yet", "now", "still", "ongoing", "and then"
+]
+
+
+class RiskKeywordDetector:
+    """
+    Single-pass risk keyword detector
+
+    Risk keywords, negation cues and scope terminators are compiled into one
+    token Aho-Corasick automaton at import. One scan of the transcript
+    reports every risk mention with its character span and severity, and
+    marks mentions a negation cue directly governs: "no bleeding" and
+    "denies chest pain or dizziness" are negated, "no way to stop the
+    bleeding" and "no improvement, bleeding heavily" are not.
+    """
+
+    def __init__(
+        self,
+        keywords: Dict[str, str],
+        severities: Dict[str, str],
+        negation_triggers: Sequence[str] = NEGATION_TRIGGERS,
+        terminators: Sequence[str] = NEGATION_TERMINATORS,
+        fillers: Sequence[str] = NEGATION_FILLERS
+    ):
+        self.automaton = AhoCorasick()
+        for keyword, reason in keywords.items():
+            self.automaton.add(
+                [token for token, _, _ in tokenize(keyword)],
+                ("risk", keyword, reason, severities.get(keyword, "MODERATE"))
+            )
+        for trigger in negation_triggers:
+            self.automaton.add([token for token, _, _ in tokenize(trigger)], ("negation",))
+        for terminator in terminators:
+            self.automaton.add([token for token, _, _ in tokenize(terminator)], ("terminator",))
+        for filler in fillers:
+            self.automaton.add([token for token, _, _ in tokenize(filler)], ("filler",))
+        self.automaton.build()
+
+    def detect(self, text: str) -> List[Dict[str, Any]]:
+        tokens = tokenize(text)
+        matches: List[Dict[str, Any]] = []
+        node = 0
+        # A term starting at token `governed` is negated; -1 when no cue is in scope
+        governed = -1
+        # Token after the last negated term, where "or"/"nor" carries the negation on
+        chained = -1
+        previous_end = 0
+        for position, (token, start, end) in enumerate(tokens):
+            if any(char in ",.;:!?" for char in text[previous_end:start]):
+                governed = chained = -1
+                node = 0
+            previous_end = end
+            if position == chained and token in NEGATION_CONJUNCTIONS:
+                governed = position + 1
+            node = self.automaton.step(node, token)
+            for length, value in self.automaton.outputs(node):
+                first = position - length + 1
+                if value[0] == "negation":
+                    governed = position + 1
+                elif value[0] == "terminator":
+                    governed = chained = -1
+                elif value[0] == "filler":
+                    if first == governed:
+                        governed = position + 1
+                else:
+                    _, keyword, reason, severity = value
+                    negated = first == governed
+                    if negated:
+                        chained = position + 1
+                    matches.append({
+                        "keyword": keyword,
+                        "reason": reason,
+                        "severity": severity,
+                        "start": tokens[first][1],
+                        "end": end,
+                        "text": text[tokens[first][1]:end],
+                        "negated": negated
+                    })
+        return matches
+
+
+risk_detector = RiskKeywordDetector(RISK_KEYWORDS, RISK_KEYWORD_SEVERITY)
+
+# Phrases that make a transcript with no risk mentions confidently routine
+BENIGN_CUES = [
+    "resting comfortably", "stable", "no complaints", "no acute distress", "alert and oriented",
+    "vitals normal", "vitals within normal limits", "improving", "feeling better", "ambulatory"
+]
+_BENIGN_PATTERN = re.compile(r"(?<!not )(?<!no )\b(" + "|".join(re.escape(cue) for cue in BENIGN_CUES) + r")\b", re.IGNORECASE)
+# Negation or change-over-time words near a benign cue ("no longer stable",
+# "was stable, now crashing") mean it no longer describes the patient
+BENIGN_QUALIFIERS = {
+    "no", "not", "never", "isn", "longer", "yet", "was", "were", "previously", "earlier", "initially",
+    "until", "now", "still", "but", "however", "getting", "becoming", "worse", "worsening", "deteriorating"
+}
+BENIGN_QUALIFIER_WINDOW = 3
+_DOSE_PATTERN = re.compile(r"\b\d+(\.\d+)?\s*(mg|mcg|g|ml|units?|l/min)\b", re.IGNORECASE)
+# Giving something to a patient with allergies or current medications needs the model
+_ADMINISTRATION_PATTERN = re.compile(
+    r"\b(giv(e|es|ing|en)|gave|push(es|ed|ing)?|start(s|ed|ing)?|administer(s|ed|ing)?|hang(ing)?|bolus(ing)?)\b",
+    re.IGNORECASE
+)
+RISK_RULE_CONFIDENCE = {"CRITICAL": 0.95, "HIGH": 0.85, "MODERATE": 0.6, "LOW": 0.5}
+RISK_PIPELINE_TIERS = ("drug_interactions", "local_rules", "cache", "llm", "llm_hedged", "deadline", "fallback")
+
+
+def _reads_routine(transcript: str) -> bool:
+    """True if the transcript has a benign cue and none of its cues is qualified by a nearby BENIGN_QUALIFIERS word"""
+    cues = list(_BENIGN_PATTERN.finditer(transcript))
+    for cue in cues:
+        before = _TOKEN_PATTERN.findall(transcript[:cue.start()].lower())[-BENIGN_QUALIFIER_WINDOW:]
+        after = _TOKEN_PATTERN.findall(transcript[cue.end():].lower())[:BENIGN_QUALIFIER_WINDOW]
+        if BENIGN_QUALIFIERS.intersection(before + after):
+            return False
+    return bool(cues)
+
+
+def _mentions_history(transcript: str, patient_history: PatientHistory) -> bool:
+    """True if the transcript names one of the patient's recorded allergies or conditions"""
+    spoken = f" {' '.join(token for token, _, _ in tokenize(transcript))} "
+    for entry in list(patient_history.allergies) + list(patient_history.medical_conditions):
+        name = " ".join(token for token, _, _ in tokenize(entry))
+        if name and f" {name} " in spoken:
+            return True
+    return False
+
+
+def classify_risk_locally(transcript: str, patient_history: Optional[PatientHistory] = None) -> Dict[str, Any]:
+    """
+    Cheap rule-based risk call with a confidence score (0-1)
+
+    Affirmed risk keywords give a WARNING as confident as their severity.
+    Without them the transcript is SAFE: confidently so only when it reads
+    as routine (a benign cue, no risk mention even negated, and no negation
+    or temporal word next to the cue), much less so when it mentions a drug
+    or dose (dosing and contraindications need the model), names one of the
+    patient's allergies or conditions, gives something to a patient with
+    allergies or current medications, or is a long narrative.
+    """
+    risks = risk_detector.detect(transcript)
+    affirmed = sorted(
+        (risk for risk in risks if not risk["negated"]),
+        key=lambda risk: SEVERITY_RANK[risk["severity"]],
+        reverse=True
+    )
+    if affirmed:
+        reason = "; ".join(dict.fromkeys(risk["reason"] for risk in affirmed))
+        return {
+            "status": "WARNING",
+            "reason": reason,
+            "severity": affirmed[0]["severity"],
+            "confidence": RISK_RULE_CONFIDENCE[affirmed[0]["severity"]],
+            "risks": risks
+        }
+
+    confidence = 0.9 if not risks and _reads_routine(transcript) else 0.7
+    if _DOSE_PATTERN.search(transcript) or reference_data.current.interaction_graph.normalizer.normalize(transcript):
+        confidence = 0.4
+    elif patient_history is not None and (
+        _mentions_history(transcript, patient_history)
+        or (
+            _ADMINISTRATION_PATTERN.search(transcript)
+            and (patient_history.allergies or patient_history.current_medications)
+        )
+    ):
+        confidence = 0.4
+    elif len(transcript.split()) > 40:
+        confidence -= 0.2
+    return {"status": "SAFE", "reason": None, "confidence": round(confidence, 2), "risks": risks}
+
+
+def risk_pipeline_hit_rates() -> Dict[str, Optional[float]]:
+    """Share of analyses resolved by each tier"""
+    counts = {tier: metrics.counters.get(f"risk_pipeline.{tier}", 0) for tier in RISK_PIPELINE_TIERS}
+    total = sum(counts.values())
+    return {tier: (round(count / total, 4) if total else None) for tier, count in counts.items()}
+
+
+metrics.register_gauge("risk_pipeline.hit_rates", risk_pipeline_hit_rates)
+
+
+@dataclass
+class _RiskCacheEntry:
+    result: Dict[str, Any]
+    expires_at: float
+    context_key: str
+    tokens: FrozenSet[str]
+    # Numbers and negation words in order; near duplicates must match them exactly
+    guard_tokens: Tuple[str, ...]
+    session_ids: Set[str]
+
+
+class RiskAnalysisCache:
+    """
+    TTL + LRU cache of Cerebras risk verdicts
+
+    Keys are a canonical hash of the prompt inputs: the normalized transcript
+    plus the patient's allergies, conditions, current and administered
+    medications. If a threshold is set, a miss can still be served by a
+    near-duplicate transcript for the same patient context (token Jaccard
+    similarity at or above it, with the same numbers and negation words in
+    the same order), which catches the frontend re-sending a transcript
+    with different casing, punctuation or filler words. Entries are tagged with
+    the sessions that used them so medication or history changes can drop
+    them explicitly.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, near_duplicate_threshold: float = 0.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self._entries: "OrderedDict[str, _RiskCacheEntry]" = OrderedDict()
+        self._by_context: Dict[str, Set[str]] = {}
+        self._by_session: Dict[str, Set[str]] = {}
+        metrics.register_gauge("risk_cache.entries", lambda: len(self._entries))
+
+    @staticmethod
+    def _canonical_list(values: Sequence[Union[str, Dict[str, Any]]]) -> List[str]:
+        return sorted(" ".join(token for token, _, _ in tokenize(medication_name(value))) for value in values)
+
+    def context_key(
+        self,
+        patient_history: PatientHistory,
+        administered_medications: Sequence[Union[str, Dict[str, Any]]]
+    ) -> str:
+        canonical = {
+            "allergies": self._canonical_list(patient_history.allergies),
+            "conditions": self._canonical_list(patient_history.medical_conditions),
+            "current": self._canonical_list(patient_history.current_medications),
+            "administered": self._canonical_list(administered_medications)
+        }
+        return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _transcript_tokens(transcript: str) -> List[str]:
+        # "324mg" and "324 mg" are the same dose
+        spaced = re.sub(r"(\d)([a-z])", r"\1 \2", transcript.lower())
+        return [token for token, _, _ in tokenize(spaced)]
+
+    # "Isn't" tokenizes as "isn", "t"; the first token of each cue is enough
+    _NEGATION_TOKENS = frozenset(tokenize(trigger)[0][0] for trigger in NEGATION_TRIGGERS) | {"don", "won", "cannot"}
+
+    @classmethod
+    def _guard_tokens(cls, tokens: Sequence[str]) -> Tuple[str, ...]:
+        # Jaccard ignores that "4 mg" vs "40 mg" or "give" vs "not give" flips the answer
+        return tuple(token for token in tokens if token in cls._NEGATION_TOKENS or any(char.isdigit() for char in token))
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_context.get(entry.context_key)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_context[entry.context_key]
+        for session_id in entry.session_ids:
+            session_keys = self._by_session.get(session_id)
+            if session_keys is not None:
+                session_keys.discard(key)
+                if not session_keys:
+                    del self._by_session[session_id]
+
+    def _tag(self, key: str, session_id: Optional[str]) -> None:
+        if session_id:
+            self._entries[key].session_ids.add(session_id)
+            self._by_session.setdefault(session_id, set()).add(key)
+
+    def get(self, transcript: str, context_key: str, session_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        tokens = self._transcript_tokens(transcript)
+        key = hashlib.sha256(f"{context_key}|{' '.join(tokens)}".encode("utf-8")).hexdigest()
+        now = time.monotonic()
+
+        entry = self._entries.get(key)
+        match = "exact"
+        if entry is None and self.near_duplicate_threshold > 0:
+            token_set = frozenset(tokens)
+            guard_tokens = self._guard_tokens(tokens)
+            best_similarity = 0.0
+            for candidate_key in self._by_context.get(context_key, ()):
+                candidate = self._entries[candidate_key]
+                if candidate.guard_tokens != guard_tokens:
+                    continue
+                union = len(token_set | candidate.tokens)
+                similarity = len(token_set & candidate.tokens) / union if union else 1.0
+                if similarity >= self.near_duplicate_threshold and similarity > best_similarity:
+                    key, entry, best_similarity = candidate_key, candidate, similarity
+            match = "near_duplicate"
+
+        if entry is not None and entry.expires_at <= now:
+            self._drop(key)
+            entry = None
+        if entry is None:
+            metrics.incr("risk_cache.misses")
+            return None
+
+        self._entries.move_to_end(key)
+        self._tag(key, session_id)
+        metrics.incr(f"risk_cache.{match}_hits")
+        return {**entry.result, "cache": match}
+
+    def put(self, transcript: str, context_key: str, result: Dict[str, Any], session_id: Optional[str] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        tokens = self._transcript_tokens(transcript)
+        key = hashlib.sha256(f"{context_key}|{' '.join(tokens)}".encode("utf-8")).hexdigest()
+        self._drop(key)
+        self._entries[key] = _RiskCacheEntry(
+            result=dict(result),
+            expires_at=time.monotonic() + self.ttl,
+            context_key=context_key,
+            tokens=frozenset(tokens),
+            guard_tokens=self._guard_tokens(tokens),
+            session_ids=set()
+        )
+        self._by_context.setdefault(context_key, set()).add(key)
+        self._tag(key, session_id)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def invalidate_session(self, session_id: str) -> int:
+        """Drop every verdict a session used (its medications or history changed)"""
+        keys = list(self._by_session.get(session_id, ()))
+        for key in keys:
+            self._drop(key)
+        if keys:
+            metrics.incr("risk_cache.invalidations", len(keys))
+        return len(keys)
+
+
+risk_cache = RiskAnalysisCache(RISK_CACHE_SIZE, RISK_CACHE_TTL, RISK_CACHE_NEAR_DUPLICATE_THRESHOLD)
+
+
+
 async def analyze_medical_risk(
     transcript: str,
     patient_history: PatientHistory,
-    administered_medications: List[str]
+    administered_medications: List[Union[str, Dict[str, Any]]],
+    timings: Optional[Dict[str, Optional[float]]] = None,
+    drug_warnings: Optional[List[Dict[str, str]]] = None,
+    session_id: Optional[str] = None,
+    llm_deadline: Optional[float] = None
 ) -> Dict[str, Any]:
     """
-    Analyze medical transcript for safety risks using Cerebras Llama-3.1-70b
+    Analyze medical transcript for safety risks in tiers: the drug
+    interaction graph, then local rules, then Cerebras Llama-3.1-70b only
+    when the rules are less confident than RISK_LLM_CONFIDENCE_THRESHOLD
     
     Args:
         transcript: Voice transcription of paramedic actions/observations
         patient_history: Patient's medical history including allergies
         administered_medications: List of medications already given
+        timings: Optional dict filled with per-stage durations in ms
+                 ('local_checks', and 'llm' when Cerebras is called)
+        drug_warnings: Interaction warnings already known for the session
+                       (checked here when not given)
+        session_id: Session the analysis is for, so cached LLM verdicts can
+                    be invalidated when its medications change
+        llm_deadline: time.perf_counter() value by which Cerebras must have
+                      answered; otherwise the local rule result is returned
+                      with tier 'deadline'
     
     Returns:
-        Dictionary with 'status' ('SAFE' or 'WARNING') and 'reason'
+        Dictionary with 'status' ('SAFE' or 'WARNING'), 'reason' and the
+        'tier' that decided it ('llm_hedged' when a hedged request won)
     """
-    
+    if timings is None:
+        timings = {}
+    stage_start = time.perf_counter()
+
+    def resolved(tier: str, result: Dict[str, Any], tier_start: float) -> Dict[str, Any]:
+        metrics.incr(f"risk_pipeline.{tier}")
+        metrics.observe(f"risk_pipeline.{tier}_ms", (time.perf_counter() - tier_start) * 1000)
+        result["tier"] = tier
+        return result
+
     # First check drug interactions locally
-    drug_warnings = check_drug_interactions(
-        patient_history.current_medications,
-        administered_medications
-    )
+    if drug_warnings is None:
+        drug_warnings = check_drug_interactions(
+            patient_history.current_medications,
+            administered_medications
+        )
+    timings["local_checks"] = (time.perf_counter() - stage_start) * 1000
     
     if drug_warnings:
         warning_text = "; ".join([
             f"{w['risk']} - {w['drug1']} + {w['drug2']}: {w['recommendation']}"
             for w in drug_warnings
         ])
-        return {
+        return resolved("drug_interactions", {
             "status": "WARNING",
             "reason": warning_text,
             "raw_response": f"Drug interaction detected: {warning_text}",
             "source": "local_database"
-        }
+        }, stage_start)
     
-    # Skip remote analysis if no real Cerebras key is configured
-    if not HAS_CEREBRAS_KEY:
-        # Fallback: Simple keyword-based risk detection for demo purposes
-        transcript_lower = transcript.lower()
-        risk_keywords = {
-            "shock": "Possible shock detected",
-            "hypotension": "Hypotension detected",
-            "dropping": "Unstable vitals detected",
-            "bleeding": "Active hemorrhage detected",
-            "unconscious": "Altered mental status detected",
-            "seizure": "Seizure activity detected",
-            "difficulty breathing": "Respiratory distress detected",
-            "chest pain": "Cardiac event detected",
-            "tachycardia": "High heart rate detected",
-            "bradycardia": "Low heart rate detected",
-            "desaturation": "Low oxygen saturation detected",
-            "hypoxia": "Hypoxia detected",
-            "stroke": "Possible stroke symptoms",
-            "slurred": "Neurological deficit detected",
-            "diaphoretic": "Sign of distress detected",
-            "pale": "Sign of shock/distress detected"
-        }
-        
-        for keyword, reason in risk_keywords.items():
-            if keyword in transcript_lower:
-                return {
-                    "status": "WARNING",
-                    "reason": reason,
-                    "raw_response": f"Local detection: {reason}",
-                    "source": "local_fallback"
-                }
+    # Local rules: compiled keyword detection plus a confidence score
+    rules_start = time.perf_counter()
+    local_result = classify_risk_locally(transcript, patient_history)
+    timings["local_checks"] = (time.perf_counter() - stage_start) * 1000
+
+    if not HAS_CEREBRAS_KEY or local_result["confidence"] >= RISK_LLM_CONFIDENCE_THRESHOLD:
+        if local_result["status"] == "WARNING":
+            local_result["raw_response"] = f"Local detection: {local_result['reason']}"
+            local_result["source"] = "local_fallback" if not HAS_CEREBRAS_KEY else "local_rules"
+        elif not HAS_CEREBRAS_KEY:
+            local_result["raw_response"] = "Cerebras analysis skipped (API key not configured). No obvious risks detected locally."
+            local_result["source"] = "local_only"
+        else:
+            local_result["raw_response"] = "Local rules confident no risk; LLM analysis skipped."
+            local_result["source"] = "local_rules"
+        return resolved("local_rules", local_result, rules_start)
 
-        return {
-            "status": "SAFE",
-            "reason": None,
-            "raw_response": "Cerebras analysis skipped (API key not configured). No obvious risks detected locally.",
-            "source": "local_only"
-        }
+    # Reuse a recent verdict for the same (or a near-duplicate) prompt
+    context_key = risk_cache.context_key(patient_history, administered_medications)
+    cached_result = risk_cache.get(transcript, context_key, session_id)
+    if cached_result is not None:
+        return resolved("cache", cached_result, stage_start)
 
     # Construct context-aware prompt
     history_context = f"""
 Patient Allergies: {', '.join(patient_history.allergies) if patient_history.allergies else 'None reported'}
 Current Medications: {', '.join(patient_history.current_medications) if patient_history.current_medications else 'None'}
 Medical Conditions: {', '.join(patient_history.medical_conditions) if patient_history.medical_conditions else 'None'}
-Medications Administered This Session: {', '.join(administered_medications) if administered_medications else 'None yet'}
+Medications Administered This Session: {', '.join(medication_name(m) for m in administered_medications) if administered_medications else 'None yet'}
 """
     
     system_prompt = """You are a medical safety guardrail AI for emergency medical services. 
@@ -562,80 +3214,344 @@ Paramedic Transcript:
 
 Analysis:"""
     
-    headers = {
-        "Authorization": f"Bearer {CEREBRAS_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "model": "llama-3.3-70b",
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        "temperature": 0.1,
-        "max_tokens": 150
-    }
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
     
+    llm_start = time.perf_counter()
+    llm_timeout = CEREBRAS_TIMEOUTS["risk_analysis"] if llm_deadline is None else llm_deadline - llm_start
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                CEREBRAS_API_URL,
-                headers=headers,
-                json=payload
+        try:
+            ai_response, llm_path = await call_cerebras_within(
+                messages, purpose="risk_analysis", timeout=llm_timeout, temperature=0.1, max_tokens=150
             )
-            response.raise_for_status()
-            
-            result = response.json()
-            ai_response = result["choices"][0]["message"]["content"].strip()
-            
-            # Parse response
-            if ai_response.startswith("SAFE"):
-                return {
-                    "status": "SAFE",
-                    "reason": None,
-                    "raw_response": ai_response,
-                    "source": "cerebras_ai"
-                }
-            elif ai_response.startswith("WARNING:"):
-                warning_text = ai_response.replace("WARNING:", "").strip()
-                return {
-                    "status": "WARNING",
-                    "reason": warning_text,
-                    "raw_response": ai_response,
-                    "source": "cerebras_ai"
-                }
-            else:
-                return {
-                    "status": "WARNING",
-                    "reason": f"Unusual AI response: {ai_response}",
-                    "raw_response": ai_response,
-                    "source": "cerebras_ai"
-                }
+        finally:
+            timings["llm"] = (time.perf_counter() - llm_start) * 1000
+        
+        # Parse response
+        if ai_response.startswith("SAFE"):
+            result = {
+                "status": "SAFE",
+                "reason": None,
+                "raw_response": ai_response,
+                "source": "cerebras_ai"
+            }
+        elif ai_response.startswith("WARNING:"):
+            warning_text = ai_response.replace("WARNING:", "").strip()
+            result = {
+                "status": "WARNING",
+                "reason": warning_text,
+                "raw_response": ai_response,
+                "source": "cerebras_ai"
+            }
+        else:
+            result = {
+                "status": "WARNING",
+                "reason": f"Unusual AI response: {ai_response}",
+                "raw_response": ai_response,
+                "source": "cerebras_ai"
+            }
+        risk_cache.put(transcript, context_key, result, session_id)
+        return resolved(llm_path, result, llm_start)
     
+    except asyncio.TimeoutError:
+        local_result["raw_response"] = f"Cerebras did not answer within {max(0.0, llm_timeout) * 1000:.0f}ms, using local checks only"
+        local_result["source"] = "deadline"
+        return resolved("deadline", local_result, llm_start)
+    except UpstreamUnavailableError as e:
+        local_result["raw_response"] = f"{str(e)}, using local checks only"
+        local_result["source"] = "fallback"
+        return resolved("fallback", local_result, llm_start)
     except httpx.HTTPStatusError as e:
-        # Fallback to local checks only
-        return {
-            "status": "SAFE",
-            "reason": None,
-            "raw_response": f"Cerebras API unavailable, using local checks only: {e.response.text}",
-            "source": "fallback"
-        }
+        # Fallback to the local rules' verdict
+        local_result["raw_response"] = f"Cerebras API unavailable, using local checks only: {e.response.text}"
+        local_result["source"] = "fallback"
+        return resolved("fallback", local_result, llm_start)
     except Exception as e:
-        return {
-            "status": "SAFE",
-            "reason": None,
-            "raw_response": f"Analysis unavailable: {str(e)}",
-            "source": "fallback"
-        }
+        local_result["raw_response"] = f"Analysis unavailable: {str(e)}"
+        local_result["source"] = "fallback"
+        return resolved("fallback", local_result, llm_start)
 
 
 # ============================================================================
 # ELEVENLABS INTEGRATION - Audio Alert Generation
 # ============================================================================
+class TTSAudioCache:
+    """
+    Content-addressed cache of synthesized audio
+
+    Keys hash (text, voice_id, model_id, voice_settings). Hits are served from
+    an in-memory LRU first, then from MP3 files on disk; both tiers evict
+    least recently used entries once their byte budget is exceeded.
+    """
+
+    def __init__(self, directory: str, memory_max_bytes: int, disk_max_bytes: int):
+        self.directory = directory
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        # Applies writes and deletes in the order put() decided them
+        self._disk_io = asyncio.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._index_disk()
+        metrics.register_gauge("tts_cache.memory_bytes", lambda: self._memory_bytes)
+        metrics.register_gauge("tts_cache.disk_bytes", lambda: self._disk_bytes)
+
+    @staticmethod
+    def key_for(text: str, voice_id: str, model_id: str, voice_settings: Dict[str, Any]) -> str:
+        material = json.dumps([text, voice_id, model_id, voice_settings], sort_keys=True)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def _index_disk(self) -> None:
+        """Rebuild the disk LRU from file mtimes (oldest first)"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".mp3"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def _remember(self, key: str, audio: bytes) -> None:
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.memory_max_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                audio = f.read()
+            os.utime(self._path(key))
+            return audio
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key: str, audio: bytes, evicted: Sequence[str]) -> None:
+        """Write an entry and delete the evicted files (file I/O only; runs in a worker thread)"""
+        tmp_path = f"{self._path(key)}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(audio)
+        os.replace(tmp_path, self._path(key))
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except FileNotFoundError:
+                pass
+
+    async def get(self, key: str) -> Optional[bytes]:
+        audio = self._memory.get(key)
+        if audio is not None:
+            self._memory.move_to_end(key)
+            metrics.incr("tts_cache.memory_hits")
+            return audio
+        if key in self._disk:
+            self._disk.move_to_end(key)
+            audio = await asyncio.to_thread(self._read_disk, key)
+            if audio is not None:
+                self._remember(key, audio)
+                metrics.incr("tts_cache.disk_hits")
+                return audio
+            self._disk_bytes -= self._disk.pop(key, 0)
+        metrics.incr("tts_cache.misses")
+        return None
+
+    async def put(self, key: str, audio: bytes) -> None:
+        if not audio:
+            return
+        self._remember(key, audio)
+        # LRU bookkeeping stays on the loop; the thread only touches files
+        if key in self._disk:
+            self._disk_bytes -= self._disk.pop(key)
+        self._disk[key] = len(audio)
+        self._disk_bytes += len(audio)
+        evicted = []
+        while self._disk_bytes > self.disk_max_bytes and len(self._disk) > 1:
+            old_key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            evicted.append(old_key)
+        try:
+            async with self._disk_io:
+                await asyncio.to_thread(self._write_disk, key, audio, evicted)
+        except OSError as e:
+            print(f"TTS cache write failed: {str(e)}")
+            if self._disk.get(key) == len(audio):
+                self._disk_bytes -= self._disk.pop(key)
+
+
+tts_cache = TTSAudioCache(
+    TTS_CACHE_DIR,
+    memory_max_bytes=int(TTS_CACHE_MEMORY_MB * 1024 * 1024),
+    disk_max_bytes=int(TTS_CACHE_DISK_MB * 1024 * 1024)
+)
+
+
+def _tts_payload(text: str) -> Dict[str, Any]:
+    return {
+        "text": text,
+        "model_id": ELEVENLABS_MODEL_ID,
+        "voice_settings": ELEVENLABS_VOICE_SETTINGS
+    }
+
+
+class TTSSynthesis:
+    """One streaming ElevenLabs synthesis of a clip and the chunks received so far"""
+
+    def __init__(self, cache_key: str, text: str):
+        self.cache_key = cache_key
+        self.text = text
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.listeners = 0
+        self.task: Optional[asyncio.Task] = None
+        # Resolved once ElevenLabs has accepted the request (or failed before any audio)
+        self.opened: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.opened.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self.changed = asyncio.Condition()
+
+    async def notify(self) -> None:
+        async with self.changed:
+            self.changed.notify_all()
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        """Every chunk from the start of the clip, following the live synthesis"""
+        sent = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: sent < len(self.chunks) or self.done)
+            while sent < len(self.chunks):
+                yield self.chunks[sent]
+                sent += 1
+            if self.done and sent == len(self.chunks):
+                if self.error is not None:
+                    raise self.error
+                return
+
+    async def audio(self) -> bytes:
+        """The complete clip once synthesis has finished"""
+        async with self.changed:
+            await self.changed.wait_for(lambda: self.done)
+        if self.error is not None:
+            raise self.error
+        return b"".join(self.chunks)
+
+
+class TTSSynthesisRegistry:
+    """
+    Shares in-flight ElevenLabs syntheses between everyone waiting on a clip
+
+    The first request for an uncached clip opens ElevenLabs' streaming TTS
+    endpoint. Later requests for the same clip (the background audio job,
+    a dashboard streaming /audio/{handle}, a second viewer) replay what
+    has arrived and then follow the live stream, so each clip costs one
+    upstream call. The finished clip goes into the TTS cache. A synthesis
+    holds the ElevenLabs guard slot until it ends and is cancelled when
+    its last listener leaves.
+    """
+
+    def __init__(self):
+        self._live: Dict[str, TTSSynthesis] = {}
+        metrics.register_gauge("tts_synthesis.in_flight", lambda: len(self._live))
+
+    async def join(self, text: str) -> TTSSynthesis:
+        """
+        Listen to the synthesis of `text`, starting it if none is running;
+        raises UpstreamUnavailableError or the upstream error if ElevenLabs
+        refuses or fails before sending audio. Callers must leave() after.
+        """
+        cache_key = TTSAudioCache.key_for(text, ELEVENLABS_VOICE_ID, ELEVENLABS_MODEL_ID, ELEVENLABS_VOICE_SETTINGS)
+        synthesis = self._live.get(cache_key)
+        if synthesis is None:
+            synthesis = TTSSynthesis(cache_key, text)
+            self._live[cache_key] = synthesis
+            synthesis.task = asyncio.create_task(self._run(synthesis))
+        else:
+            metrics.incr("tts_synthesis.shared")
+        synthesis.listeners += 1
+        try:
+            await asyncio.shield(synthesis.opened)
+        except BaseException:
+            self.leave(synthesis)
+            raise
+        return synthesis
+
+    def leave(self, synthesis: TTSSynthesis) -> None:
+        synthesis.listeners -= 1
+        if synthesis.listeners > 0 or synthesis.done:
+            return
+        # Nobody is listening any more: free the ElevenLabs slot
+        if self._live.get(synthesis.cache_key) is synthesis:
+            del self._live[synthesis.cache_key]
+        if synthesis.task is not None:
+            synthesis.task.cancel()
+
+    async def _run(self, synthesis: TTSSynthesis) -> None:
+        client = upstream_clients.get("elevenlabs")
+        guard = upstream_guards["elevenlabs"]
+        error: Optional[BaseException] = None
+        acquired = False
+        upstream = None
+        start = time.perf_counter()
+        try:
+            await guard.acquire()
+            acquired = True
+            upstream_request = client.build_request(
+                "POST",
+                f"{ELEVENLABS_API_URL}/{ELEVENLABS_VOICE_ID}/stream",
+                json=_tts_payload(synthesis.text),
+                timeout=ELEVENLABS_TIMEOUT
+            )
+            upstream = await client.send(upstream_request, stream=True)
+            upstream.raise_for_status()
+            metrics.observe("upstream.elevenlabs.tts_first_byte_ms", (time.perf_counter() - start) * 1000)
+            synthesis.opened.set_result(None)
+            async for chunk in upstream.aiter_bytes():
+                synthesis.chunks.append(chunk)
+                await synthesis.notify()
+            metrics.observe("upstream.elevenlabs.tts_ms", (time.perf_counter() - start) * 1000)
+            await tts_cache.put(synthesis.cache_key, b"".join(synthesis.chunks))
+        except BaseException as e:
+            error = e
+            if not synthesis.opened.done():
+                if isinstance(e, asyncio.CancelledError):
+                    synthesis.opened.cancel()
+                else:
+                    synthesis.opened.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            print(f"Audio synthesis failed: {str(e)}")
+        finally:
+            if acquired:
+                guard.release(error)
+            if upstream is not None:
+                await upstream.aclose()
+            synthesis.error = error
+            synthesis.done = True
+            if self._live.get(synthesis.cache_key) is synthesis:
+                del self._live[synthesis.cache_key]
+            await synthesis.notify()
+
+
+tts_syntheses = TTSSynthesisRegistry()
+
+
 async def generate_audio_alert(text: str) -> bytes:
     """
     Generate audio alert using ElevenLabs Text-to-Speech
+    Repeated phrases are served from the TTS audio cache; a clip that is
+    already being synthesized is shared rather than requested again
     
     Args:
         text: Warning text to convert to speech
@@ -646,46 +3562,248 @@ async def generate_audio_alert(text: str) -> bytes:
     if not HAS_ELEVENLABS_KEY:
         return b""
 
-    headers = {
-        "xi-api-key": ELEVENLABS_API_KEY,
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "text": text,
-        "model_id": "eleven_multilingual_v2",
-        "voice_settings": {
-            "stability": 0.5,
-            "similarity_boost": 0.75,
-            "style": 0.0,
-            "use_speaker_boost": True
-        }
-    }
-    
-    url = f"{ELEVENLABS_API_URL}/{ELEVENLABS_VOICE_ID}"
-    
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                url,
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-            return response.content
-    
-    except Exception as e:
-        # Return empty bytes if audio generation fails
-        print(f"Audio generation failed: {str(e)}")
-        return b""
+    cache_key = TTSAudioCache.key_for(text, ELEVENLABS_VOICE_ID, ELEVENLABS_MODEL_ID, ELEVENLABS_VOICE_SETTINGS)
+    cached_audio = await tts_cache.get(cache_key)
+    if cached_audio is not None:
+        return cached_audio
+
+    try:
+        synthesis = await tts_syntheses.join(text)
+    except Exception as e:
+        # Return empty bytes if audio generation fails
+        print(f"Audio generation failed: {str(e)}")
+        return b""
+    try:
+        return await synthesis.audio()
+    except Exception as e:
+        print(f"Audio generation failed: {str(e)}")
+        return b""
+    finally:
+        tts_syntheses.leave(synthesis)
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that awaits `on_close(error)` however the response
+    ends; a generator's finally never runs if the client disconnects before
+    its first item is pulled
+    """
+
+    def __init__(self, content: Any, on_close: Callable[[Optional[BaseException]], Awaitable[None]], **kwargs: Any):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable[..., Any], send: Callable[..., Any]) -> None:
+        error: Optional[BaseException] = None
+        try:
+            await super().__call__(scope, receive, send)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            await self.on_close(error)
+
+
+async def audio_stream_response(text: str) -> Response:
+    """
+    Serve speech for `text` as audio/mpeg
+
+    Cached audio is returned directly. Otherwise the response follows the
+    clip's shared ElevenLabs synthesis (started here if nobody else has),
+    which is opened before the response starts so upstream failures still
+    map to an HTTP error; chunks are piped to the client as they arrive and
+    the complete clip is cached once the stream finishes. The listener is
+    dropped however the response ends (even if the body is never read),
+    and a refused call maps to 503.
+    """
+    if not HAS_ELEVENLABS_KEY:
+        raise HTTPException(status_code=503, detail="ElevenLabs API key not configured")
+
+    cache_key = TTSAudioCache.key_for(text, ELEVENLABS_VOICE_ID, ELEVENLABS_MODEL_ID, ELEVENLABS_VOICE_SETTINGS)
+    cached_audio = await tts_cache.get(cache_key)
+    if cached_audio is not None:
+        return Response(content=cached_audio, media_type="audio/mpeg")
+
+    try:
+        synthesis = await tts_syntheses.join(text)
+    except UpstreamUnavailableError as e:
+        print(f"Audio streaming refused: {str(e)}")
+        raise HTTPException(status_code=503, detail="Audio synthesis temporarily unavailable")
+    except Exception as e:
+        print(f"Audio streaming failed: {str(e)}")
+        raise HTTPException(status_code=502, detail="Failed to generate audio")
+    left = False
+
+    async def leave(error: Optional[BaseException] = None) -> None:
+        nonlocal left
+        if not left:
+            left = True
+            tts_syntheses.leave(synthesis)
+
+    async def relay() -> AsyncIterator[bytes]:
+        try:
+            async for chunk in synthesis.stream():
+                yield chunk
+        finally:
+            await leave()
+
+    return ClosingStreamingResponse(relay(), on_close=leave, media_type="audio/mpeg")
+
+
+class AudioHandleRegistry:
+    """
+    Maps short-lived audio handles to the text they speak
+
+    Handles are the TTS cache key, so the same alert always gets the same
+    URL and repeat plays hit the cache. Oldest handles are dropped first.
+    """
+
+    def __init__(self, max_handles: int = 4096):
+        self.max_handles = max_handles
+        self._texts: "OrderedDict[str, str]" = OrderedDict()
+
+    def register(self, text: str) -> str:
+        handle = TTSAudioCache.key_for(text, ELEVENLABS_VOICE_ID, ELEVENLABS_MODEL_ID, ELEVENLABS_VOICE_SETTINGS)
+        self._texts[handle] = text
+        self._texts.move_to_end(handle)
+        while len(self._texts) > self.max_handles:
+            self._texts.popitem(last=False)
+        return handle
+
+    def text_for(self, handle: str) -> Optional[str]:
+        return self._texts.get(handle)
+
+
+audio_handles = AudioHandleRegistry()
+
+
+@dataclass
+class AudioJob:
+    """Background synthesis of one spoken alert; audio_url streams it from the moment the job exists"""
+    job_id: str
+    session_id: Optional[str]
+    text: str
+    status: str = "pending"
+    audio_url: Optional[str] = None
+    error: Optional[str] = None
+    created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    timings_ms: Dict[str, Optional[float]] = field(default_factory=lambda: {"queued": None, "tts": None})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "session_id": self.session_id,
+            "status": self.status,
+            "audio_url": self.audio_url,
+            "error": self.error,
+            "created_at": self.created_at,
+            "timings_ms": dict(self.timings_ms),
+            "status_url": f"/audio/jobs/{self.job_id}"
+        }
+
+
+class AudioJobRegistry:
+    """
+    Runs TTS synthesis as tracked background tasks
+
+    /analyze submits a job and returns straight away with the job's
+    audio_url, which streams the clip while it is being synthesized. The
+    job joins the same shared synthesis, so the clip is requested from
+    ElevenLabs once however many listeners there are. When it lands in the
+    TTS cache the session's WebSocket subscribers get an `audio_ready`
+    message. Finished jobs are kept (oldest dropped first) for the status
+    endpoint.
+    """
+
+    def __init__(self, max_jobs: int = 1024):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, AudioJob]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def submit(self, text: str, session_id: Optional[str] = None) -> AudioJob:
+        job = AudioJob(
+            job_id=uuid.uuid4().hex,
+            session_id=session_id,
+            text=text,
+            audio_url=f"/audio/{audio_handles.register(text)}"
+        )
+        self._jobs[job.job_id] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+        task = asyncio.create_task(self._run(job, time.perf_counter()))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        metrics.incr("audio_jobs.submitted")
+        return job
+
+    def get(self, job_id: str) -> Optional[AudioJob]:
+        return self._jobs.get(job_id)
+
+    async def _run(self, job: AudioJob, submitted: float) -> None:
+        start = time.perf_counter()
+        job.status = "running"
+        job.timings_ms["queued"] = (start - submitted) * 1000
+        try:
+            audio = await generate_audio_alert(job.text)
+            if audio:
+                job.status = "done"
+            else:
+                job.status = "failed"
+                job.error = "Failed to generate audio"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+        if job.status == "failed":
+            job.audio_url = None
+        job.timings_ms["tts"] = (time.perf_counter() - start) * 1000
+        metrics.observe("analyze.stage.tts_ms", job.timings_ms["tts"])
+        metrics.incr(f"audio_jobs.{job.status}")
+
+        if job.session_id:
+            await manager.send_to_session(job.session_id, {"type": "audio_ready", **job.to_dict()})
+
+    async def aclose(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+audio_jobs = AudioJobRegistry()
+
+
+def common_alert_phrases() -> List[str]:
+    """Phrases the dashboard speaks most: local risk warnings and protocol readouts"""
+    phrases = [f"Warning: {reason}" for reason in dict.fromkeys(RISK_KEYWORDS.values())]
+    phrases += [
+        f"Protocol for {protocol['protocol']}. {protocol['details']}"
+        for protocol in reference_data.current.protocols.values()
+    ]
+    return phrases
+
+
+async def prewarm_tts_cache(concurrency: int = 2) -> None:
+    """Synthesize common phrases in the background so their first playback is instant"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def warm(text: str) -> bool:
+        async with semaphore:
+            return bool(await generate_audio_alert(text))
 
+    phrases = common_alert_phrases()
+    results = await asyncio.gather(*(warm(text) for text in phrases))
+    print(f"TTS cache pre-warmed: {sum(results)}/{len(phrases)} phrases")
 
-async def create_sbar_summary(
+
+def _build_sbar_request(
     session: SessionContext,
     transcript_entries: List[TranscriptEntryModel]
-) -> str:
+) -> Tuple[str, List[Dict[str, str]]]:
     """
-    Generate an SBAR-style handoff summary from transcript context.
+    Build the SBAR prompt for a session
+
+    Returns:
+        (local fallback summary, Cerebras chat messages)
     """
     if not transcript_entries:
         raise HTTPException(status_code=400, detail="Transcript is empty.")
@@ -712,22 +3830,21 @@ async def create_sbar_summary(
     - Medications: {', '.join(session.patient_history.current_medications)}
     
     Interventions:
-    - Meds Given: {', '.join([m['medication'] for m in session.administered_medications])}
+    - Meds Given: {', '.join([medication_name(m) for m in session.administered_medications])}
     
     Transcript of Events:
     {transcript_text}
     """
 
-    if not HAS_CEREBRAS_KEY:
-        # Simple fallback summary when AI is unavailable
-        latest_statement = transcript_entries[-1].text
-        return (
-            "SBAR Handoff:\n"
-            f"S: Incoming EMS unit with patient requiring evaluation. Latest note: {latest_statement}\n"
-            f"B: {patient_context.strip()}\n"
-            "A: Awaiting AI assessment (Cerebras not configured).\n"
-            "R: Continue monitoring and follow local protocols."
-        )
+    # Simple fallback summary when AI is unavailable
+    latest_statement = transcript_entries[-1].text
+    fallback_summary = (
+        "SBAR Handoff:\n"
+        f"S: Incoming EMS unit with patient requiring evaluation. Latest note: {latest_statement}\n"
+        f"B: {patient_context.strip()}\n"
+        "A: Awaiting AI assessment (Cerebras not configured).\n"
+        "R: Continue monitoring and follow local protocols."
+    )
 
     system_prompt = (
         "You are an EMS communications expert generating concise SBAR handoffs. "
@@ -749,31 +3866,30 @@ A: ...
 R: ...
 """
 
-    payload = {
-        "model": "llama-3.3-70b",
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        "temperature": 0.2,
-        "max_tokens": 220
-    }
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    return fallback_summary, messages
 
-    headers = {
-        "Authorization": f"Bearer {CEREBRAS_API_KEY}",
-        "Content-Type": "application/json"
-    }
+
+async def create_sbar_summary(
+    session: SessionContext,
+    transcript_entries: List[TranscriptEntryModel]
+) -> str:
+    """
+    Generate an SBAR-style handoff summary from transcript context.
+    """
+    fallback_summary, messages = _build_sbar_request(session, transcript_entries)
+
+    if not HAS_CEREBRAS_KEY:
+        return fallback_summary
 
     try:
-        async with httpx.AsyncClient(timeout=12.0) as client:
-            response = await client.post(
-                CEREBRAS_API_URL,
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result["choices"][0]["message"]["content"].strip()
+        return await call_cerebras(messages, purpose="sbar", temperature=0.2, max_tokens=220)
+    except UpstreamUnavailableError as e:
+        print(f"SBAR generation skipped: {str(e)}")
+        return fallback_summary
     except Exception as e:
         print(f"SBAR generation failed: {str(e)}")
         raise HTTPException(
@@ -782,13 +3898,64 @@ R: ...
         )
 
 
+def stream_sbar_summary(
+    session: SessionContext,
+    transcript_entries: List[TranscriptEntryModel]
+) -> AsyncIterator[str]:
+    """
+    Token stream of the SBAR handoff (validates the transcript up front so
+    errors are raised before the SSE response starts); the rule-based
+    summary is streamed instead if Cerebras fails before its first token
+    """
+    fallback_summary, messages = _build_sbar_request(session, transcript_entries)
+
+    if not HAS_CEREBRAS_KEY or not upstream_guards["cerebras"].available():
+        return stream_text(fallback_summary)
+
+    async def sbar_tokens() -> AsyncIterator[str]:
+        emitted = False
+        try:
+            async for token in stream_cerebras(messages, purpose="sbar", temperature=0.2, max_tokens=220):
+                emitted = True
+                yield token
+        except Exception as e:
+            if emitted:
+                raise
+            print(f"SBAR streaming failed, using fallback: {str(e)}")
+            async for token in stream_text(fallback_summary):
+                yield token
+
+    return sbar_tokens()
+
+
 # ============================================================================
 # FASTAPI APPLICATION
 # ============================================================================
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown hooks for long-lived services"""
+    smart_memory.start()
+    upstream_clients.start()
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag(EVENT_LOOP_LAG_INTERVAL))
+    prewarm = asyncio.create_task(prewarm_tts_cache()) if HAS_ELEVENLABS_KEY and TTS_PREWARM else None
+    data_watcher = asyncio.create_task(reference_data.run_watcher()) if REFERENCE_DATA_POLL_INTERVAL > 0 else None
+    yield
+    if data_watcher is not None:
+        data_watcher.cancel()
+    if prewarm is not None:
+        prewarm.cancel()
+    lag_monitor.cancel()
+    await audio_jobs.aclose()
+    await upstream_clients.aclose()
+    await smart_memory.stop()
+    smart_memory.close()
+
+
 app = FastAPI(
     title="ResQ-AI MCP Server",
     description="Real-time EMS Triage Assistant with Medical Risk Analysis (Standalone Version)",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # Enable CORS for frontend
@@ -801,8 +3968,17 @@ app.add_middleware(
 )
 
 # Initialize services
-smart_memory = SmartMemoryManager()
-protocol_search = InMemoryProtocolSearch()
+smart_memory = SmartMemoryManager(
+    store=build_session_store(),
+    storage_path=SMART_MEMORY_JSON_PATH,
+    cache_size=SMART_MEMORY_CACHE_SIZE,
+    cache_ttl=SMART_MEMORY_CACHE_TTL,
+    flush_interval=SMART_MEMORY_FLUSH_INTERVAL,
+    io_workers=SMART_MEMORY_IO_WORKERS
+)
+reference_data = ReferenceDataStore(REFERENCE_DATA_DIR, REFERENCE_DATA_POLL_INTERVAL)
+protocol_search = CachedProtocolSearch(reference_data.current.protocol_search)
+reference_data.subscribe(lambda data: protocol_search.replace_backend(data.protocol_search))
 
 # ============================================================================
 # WEBSOCKET CONNECTION MANAGER
@@ -811,6 +3987,7 @@ class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
         self.unit_locations: Dict[str, Dict[str, float]] = {}
+        self.session_connections: Dict[str, List[WebSocket]] = {}
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
@@ -827,6 +4004,25 @@ class ConnectionManager:
                 # Handle potential disconnected clients that weren't cleanly removed
                 pass
 
+    async def connect_session(self, session_id: str, websocket: WebSocket):
+        await websocket.accept()
+        self.session_connections.setdefault(session_id, []).append(websocket)
+
+    def disconnect_session(self, session_id: str, websocket: WebSocket):
+        connections = self.session_connections.get(session_id, [])
+        if websocket in connections:
+            connections.remove(websocket)
+        if not connections:
+            self.session_connections.pop(session_id, None)
+
+    async def send_to_session(self, session_id: str, message: dict):
+        """Push a message to every client subscribed to one session"""
+        for connection in list(self.session_connections.get(session_id, [])):
+            try:
+                await connection.send_json(message)
+            except Exception:
+                self.disconnect_session(session_id, connection)
+
     async def update_location(self, unit_id: str, location: dict):
         self.unit_locations[unit_id] = location
         # Broadcast the full list of active units to everyone
@@ -837,6 +4033,81 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+
+@dataclass
+class _VitalsChannel:
+    vitals: Dict[str, Any]
+    seq: int = 0
+    viewers: Set[asyncio.Queue] = field(default_factory=set)
+
+
+class VitalsBroadcaster:
+    """
+    Per-session vitals fan-out for /ws/vitals and the SSE vitals stream
+
+    A write publishes only the fields that changed since the last one. The
+    message is serialized once and the same JSON text is queued for every
+    viewer, so N viewers of a session cost one encode. Each viewer has a
+    bounded queue; one that falls behind is cleared and sent a fresh
+    snapshot instead of the deltas it missed.
+    """
+
+    def __init__(self, queue_size: int = VITALS_VIEWER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._channels: Dict[str, _VitalsChannel] = {}
+        metrics.register_gauge("vitals_stream.viewers", lambda: sum(len(channel.viewers) for channel in self._channels.values()))
+
+    def _message(self, session_id: str, channel: _VitalsChannel, kind: str, fields: Dict[str, Any]) -> str:
+        metrics.incr("vitals_stream.serializations")
+        return json.dumps({"type": kind, "session_id": session_id, "seq": channel.seq, "vitals": fields})
+
+    def subscribe(self, session_id: str, vitals: PatientVitals) -> asyncio.Queue:
+        """Register a viewer; its queue starts with a snapshot of the current vitals"""
+        channel = self._channels.get(session_id)
+        if channel is None:
+            channel = self._channels[session_id] = _VitalsChannel(vitals.model_dump())
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        queue.put_nowait(self._message(session_id, channel, "vitals_snapshot", channel.vitals))
+        channel.viewers.add(queue)
+        return queue
+
+    def unsubscribe(self, session_id: str, queue: asyncio.Queue) -> None:
+        channel = self._channels.get(session_id)
+        if channel is None:
+            return
+        channel.viewers.discard(queue)
+        if not channel.viewers:
+            del self._channels[session_id]
+
+    def publish(self, session_id: str, vitals: PatientVitals) -> None:
+        """Queue the changed fields for every viewer of the session (no-op without viewers)"""
+        channel = self._channels.get(session_id)
+        if channel is None:
+            return
+        current = vitals.model_dump()
+        changes = {name: value for name, value in current.items() if channel.vitals.get(name) != value}
+        if not changes:
+            return
+        channel.vitals = current
+        channel.seq += 1
+        metrics.incr("vitals_stream.deltas")
+        message = self._message(session_id, channel, "vitals_delta", changes)
+        snapshot = None
+        for queue in channel.viewers:
+            if queue.full():
+                # Slow viewer: drop its backlog and resync
+                while not queue.empty():
+                    queue.get_nowait()
+                if snapshot is None:
+                    snapshot = self._message(session_id, channel, "vitals_snapshot", channel.vitals)
+                queue.put_nowait(snapshot)
+                metrics.incr("vitals_stream.resyncs")
+            else:
+                queue.put_nowait(message)
+
+
+vitals_stream = VitalsBroadcaster()
+
 # ============================================================================
 # AI ASSISTANT ENDPOINT
 # ============================================================================
@@ -845,10 +4116,11 @@ class AssistantRequest(BaseModel):
     language: str = "english"
 
 @app.post("/assistant/ask")
-async def ask_assistant(request: AssistantRequest):
+async def ask_assistant(request: AssistantRequest, stream: bool = Query(False)):
     """
     Handle natural language queries about medical protocols using Cerebras LLM.
     Supports English and Urdu.
+    With ?stream=true the answer is relayed token by token as Server-Sent Events.
     """
     query = request.query.lower()
     lang = request.language.lower()
@@ -868,8 +4140,12 @@ async def ask_assistant(request: AssistantRequest):
     if not HAS_CEREBRAS_KEY:
         # Fallback if no key
         if results:
-            return {"response": f"Protocol: {results[0]['protocol']}. {results[0]['details']}"}
-        return {"response": "I couldn't find a protocol for that and AI is offline."}
+            offline_response = f"Protocol: {results[0]['protocol']}. {results[0]['details']}"
+        else:
+            offline_response = "I couldn't find a protocol for that and AI is offline."
+        if stream:
+            return sse_response(stream_text(offline_response))
+        return {"response": offline_response}
 
     lang_instruction = "Answer in English."
     if "urdu" in lang:
@@ -889,36 +4165,37 @@ User Question:
 
 Answer:"""
 
-    headers = {
-        "Authorization": f"Bearer {CEREBRAS_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "model": "llama-3.3-70b",
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        "temperature": 0.1,
-        "max_tokens": 150
-    }
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    context_used = results[0]["protocol"] if results else "General"
+
+    if stream:
+        async def assistant_tokens() -> AsyncIterator[str]:
+            emitted = False
+            try:
+                async for token in stream_cerebras(messages, purpose="assistant", temperature=0.1, max_tokens=150):
+                    emitted = True
+                    yield token
+            except Exception as e:
+                if emitted:
+                    raise
+                print(f"LLM Assistant Error: {e}")
+                # Fallback to simple DB lookup, streamed the same way
+                fallback = f"Fallback: {results[0]['details']}" if results else "I'm having trouble connecting to the AI right now."
+                async for token in stream_text(fallback):
+                    yield token
+
+        return sse_response(assistant_tokens(), {"context_used": context_used})
     
     try:
-        async with httpx.AsyncClient(timeout=8.0) as client:
-            response = await client.post(
-                CEREBRAS_API_URL,
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-            result = response.json()
-            ai_response = result["choices"][0]["message"]["content"].strip()
-            
-            return {
-                "response": ai_response,
-                "context_used": results[0]["protocol"] if results else "General"
-            }
+        ai_response = await call_cerebras(messages, purpose="assistant", temperature=0.1, max_tokens=150)
+        
+        return {
+            "response": ai_response,
+            "context_used": context_used
+        }
             
     except Exception as e:
         print(f"LLM Assistant Error: {e}")
@@ -953,17 +4230,48 @@ async def root():
     }
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Latency histograms, counters and gauges (event loop lag, SmartMemory flushes, ...)"""
+    return metrics.snapshot()
+
+
 @app.post("/session/create")
 async def create_session(session_id: str):
     """Create a new patient session"""
-    session = smart_memory.create_session(session_id)
+    session = await smart_memory.acreate_session(session_id)
     return {"message": "Session created", "session": session}
 
 
+@app.get("/sessions")
+async def list_sessions(updated_since: Optional[str] = None, limit: int = Query(100, ge=1, le=1000)):
+    """List recently updated sessions"""
+    sessions = await smart_memory.alist_sessions(updated_since=updated_since, limit=limit)
+    return {
+        "total": len(sessions),
+        "sessions": [
+            {
+                "session_id": data["session_id"],
+                "created_at": data.get("created_at"),
+                "updated_at": data.get("updated_at"),
+                "chief_complaint": (data.get("patient_history") or {}).get("chief_complaint")
+            }
+            for data in sessions
+        ]
+    }
+
+
+@app.post("/session/export")
+async def export_sessions():
+    """Export all sessions to the SmartMemory JSON file"""
+    exported = await smart_memory.aexport_json()
+    return {"message": "Sessions exported", "path": smart_memory.storage_path, "sessions": exported}
+
+
 @app.get("/session/{session_id}")
 async def get_session(session_id: str):
     """Retrieve patient session data"""
-    session = smart_memory.get_session(session_id)
+    session = await smart_memory.aget_session(session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     return session
@@ -972,65 +4280,234 @@ async def get_session(session_id: str):
 @app.post("/session/{session_id}/update-vitals")
 async def update_vitals(session_id: str, vitals: PatientVitals):
     """Update patient vitals in session"""
-    session = smart_memory.get_session(session_id)
-    if not session:
+    def apply_vitals(session: SessionContext) -> None:
+        session.patient_vitals = vitals
+
+    updated_session = await smart_memory.mutate_session(session_id, apply_vitals)
+    if not updated_session:
         raise HTTPException(status_code=404, detail="Session not found")
-    
-    session.patient_vitals = vitals
-    updated_session = smart_memory.update_session(session)
+    vitals_stream.publish(session_id, updated_session.patient_vitals)
     return {"message": "Vitals updated", "session": updated_session}
 
 
+@app.get("/session/{session_id}/vitals/history")
+async def get_vitals_history(session_id: str, limit: int = Query(100, ge=1, le=1000)):
+    """Recorded vitals readings for a session, oldest first (full history with the SQLite backend)"""
+    if not await smart_memory.aget_session(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    history = await smart_memory.avitals_history(session_id, limit=limit)
+    return {"session_id": session_id, "total": len(history), "history": history}
+
+
+@app.get("/session/{session_id}/vitals/stream")
+async def stream_vitals(session_id: str):
+    """
+    Vitals for one session as Server-Sent Events: a `vitals_snapshot`
+    first, then a `vitals_delta` with only the changed fields on each write
+    (same messages as /ws/vitals/{session_id})
+    """
+    session = await smart_memory.aget_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    queue = vitals_stream.subscribe(session_id, session.patient_vitals)
+
+    async def unsubscribe(error: Optional[BaseException] = None) -> None:
+        vitals_stream.unsubscribe(session_id, queue)
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            while True:
+                message = await queue.get()
+                # Already JSON; only the SSE framing is added per viewer
+                yield f"data: {message}\n\n"
+        finally:
+            await unsubscribe()
+
+    # Unsubscribes even if the client is gone before the first event is pulled
+    return ClosingStreamingResponse(
+        events(),
+        on_close=unsubscribe,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/analyze")
 async def analyze_transcript(request: AnalysisRequest):
     """
     Analyze voice transcript for medical risks
-    Returns risk assessment and audio alert if warning detected
+    Returns the risk assessment immediately; a spoken alert for warnings is
+    synthesized as a background job (see GET /audio/jobs/{job_id} and the
+    `audio_ready` message on /ws/session/{session_id})
+
+    The request has a `deadline_ms` budget; the LLM may use
+    LLM_DEADLINE_FRACTION of it, after which the local verdict is returned.
+    `analysis.tier` names the path that produced the answer.
     """
+    request_start = time.perf_counter()
     # Get session context
-    session = smart_memory.get_session(request.session_id)
+    session = await smart_memory.aget_session(request.session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    
-    # Perform risk analysis
+
+    drug_warnings, _ = session_interactions.refresh(session)
+    return await run_session_analysis(
+        session,
+        request.transcript,
+        drug_warnings,
+        request_start,
+        request.deadline_ms or ANALYZE_DEADLINE_MS
+    )
+
+
+async def run_session_analysis(
+    session: SessionContext,
+    transcript: str,
+    drug_warnings: List[Dict[str, str]],
+    request_start: float,
+    deadline_ms: float
+) -> Dict[str, Any]:
+    """
+    Analyze one transcript for an already loaded session (shared by
+    /analyze and /analyze/batch); a WARNING queues the spoken alert and
+    is logged on the session
+    """
+    session_id = session.session_id
+    timings: Dict[str, Optional[float]] = {"local_checks": None, "llm": None}
     analysis_result = await analyze_medical_risk(
-        transcript=request.transcript,
+        transcript=transcript,
         patient_history=session.patient_history,
-        administered_medications=session.administered_medications
+        administered_medications=session.administered_medications,
+        timings=timings,
+        drug_warnings=drug_warnings,
+        session_id=session_id,
+        llm_deadline=request_start + deadline_ms * LLM_DEADLINE_FRACTION / 1000
     )
+    for stage, duration in timings.items():
+        if duration is not None:
+            metrics.observe(f"analyze.stage.{stage}_ms", duration)
     
     response_data = {
-        "session_id": request.session_id,
+        "session_id": session_id,
         "analysis": analysis_result,
-        "audio_alert": None
+        "audio_url": None,
+        "audio_job": None,
+        "deadline_ms": deadline_ms,
+        "timings_ms": {**timings, "tts": None}
     }
     
-    # Generate audio alert if warning detected
+    # Queue the spoken alert if warning detected; the medic gets the text now
+    # and an audio_url that starts playing while the clip is synthesized
     if analysis_result["status"] == "WARNING":
-        alert_text = f"Warning: {analysis_result['reason']}"
-        audio_bytes = await generate_audio_alert(alert_text)
-        
-        if audio_bytes:
-            import base64
-            response_data["audio_alert"] = base64.b64encode(audio_bytes).decode('utf-8')
-        
-        # Log warning in session
-        session.warnings_issued.append(WarningEntry(
-            timestamp=datetime.utcnow().isoformat(),
-            warning=analysis_result['reason']
-        ))
-        smart_memory.update_session(session)
-    
+        response_data["audio_job"] = await issue_risk_warning(session_id, analysis_result["reason"])
+        if response_data["audio_job"] is not None:
+            response_data["audio_url"] = response_data["audio_job"]["audio_url"]
+
+    response_data["timings_ms"]["total"] = (time.perf_counter() - request_start) * 1000
     return response_data
 
 
+async def issue_risk_warning(session_id: str, reason: str) -> Optional[Dict[str, Any]]:
+    """Queue the spoken alert for a risk warning and log it on the session; returns the audio job"""
+    audio_job = None
+    if HAS_ELEVENLABS_KEY:
+        audio_job = audio_jobs.submit(f"Warning: {reason}", session_id).to_dict()
+
+    # Log warning in session
+    warning_entry = WarningEntry(
+        timestamp=datetime.utcnow().isoformat(),
+        warning=reason
+    )
+    await smart_memory.mutate_session(
+        session_id,
+        lambda latest: latest.warnings_issued.append(warning_entry)
+    )
+    return audio_job
+
+
+@app.post("/analyze/batch")
+async def analyze_batch(request: AnalysisBatchRequest, stream: bool = Query(False)):
+    """
+    Analyze many (session_id, transcript) items in one request
+
+    Sessions are loaded in one SmartMemory pass and their interaction
+    warnings computed once per distinct session; the items then run
+    through the risk pipeline concurrently, at most ANALYZE_BATCH_CONCURRENCY
+    at a time. Each item's deadline starts when it gets one of those slots,
+    so items queued behind others still get their full LLM budget (their
+    `timings_ms.total` counts from then too). Results come back in request
+    order, or with ?stream=true as
+    Server-Sent Events (`event: result`, tagged with the item's `index`) in
+    completion order. An unknown session fails only its own items.
+    """
+    request_start = time.perf_counter()
+    metrics.incr("analyze.batch.requests")
+    metrics.incr("analyze.batch.items", len(request.items))
+
+    sessions = await smart_memory.aget_sessions(list(dict.fromkeys(item.session_id for item in request.items)))
+    drug_warnings = {
+        session_id: session_interactions.refresh(session)[0]
+        for session_id, session in sessions.items()
+    }
+    metrics.observe("analyze.batch.load_ms", (time.perf_counter() - request_start) * 1000)
+    slots = asyncio.Semaphore(ANALYZE_BATCH_CONCURRENCY)
+
+    async def analyze_item(index: int, item: AnalysisRequest) -> Dict[str, Any]:
+        session = sessions.get(item.session_id)
+        if session is None:
+            return {"index": index, "session_id": item.session_id, "error": "Session not found"}
+        try:
+            async with slots:
+                result = await run_session_analysis(
+                    session,
+                    item.transcript,
+                    drug_warnings[item.session_id],
+                    time.perf_counter(),
+                    item.deadline_ms or request.deadline_ms or ANALYZE_DEADLINE_MS
+                )
+        except Exception as e:
+            print(f"Batch analysis item {index} failed: {str(e)}")
+            return {"index": index, "session_id": item.session_id, "error": "Analysis failed"}
+        return {"index": index, **result}
+
+    if not stream:
+        results = await asyncio.gather(*(analyze_item(index, item) for index, item in enumerate(request.items)))
+        return {
+            "results": results,
+            "timings_ms": {"total": (time.perf_counter() - request_start) * 1000}
+        }
+
+    async def events() -> AsyncIterator[str]:
+        tasks = [asyncio.ensure_future(analyze_item(index, item)) for index, item in enumerate(request.items)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield _sse_event(await finished, event="result")
+            yield _sse_event({
+                "count": len(tasks),
+                "timings_ms": {"total": (time.perf_counter() - request_start) * 1000}
+            }, event="done")
+        finally:
+            # Client went away: stop analyses nobody will read
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/sbar/generate")
-async def generate_sbar(request: HandoffRequest):
-    """Generate SBAR handoff summary"""
-    session = smart_memory.get_session(request.session_id)
+async def generate_sbar(request: HandoffRequest, stream: bool = Query(False)):
+    """Generate SBAR handoff summary (?stream=true relays it as Server-Sent Events)"""
+    session = await smart_memory.aget_session(request.session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
+    if stream:
+        return sse_response(stream_sbar_summary(session, request.transcript_entries))
+    
     summary = await create_sbar_summary(session, request.transcript_entries)
     return {"summary": summary}
 
@@ -1064,28 +4541,21 @@ async def generate_protocol(request: ProtocolSearchRequest):
     user_prompt = f"Generate EMS protocol for: {request.symptom}"
 
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                CEREBRAS_API_URL,
-                headers={"Authorization": f"Bearer {CEREBRAS_API_KEY}", "Content-Type": "application/json"},
-                json={
-                    "model": "llama-3.3-70b",
-                    "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
-                    "temperature": 0.2
-                }
-            )
-            data = response.json()
-            content = data["choices"][0]["message"]["content"]
-            
-            return {
-                "protocols": [{
-                    "protocol": f"Dynamic Protocol: {request.symptom}",
-                    "details": content,
-                    "contraindications": ["AI Generated - Verify with Medical Control"],
-                    "score": 0.8
-                }],
-                "source": "ai_generated"
-            }
+        content = await call_cerebras(
+            [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
+            purpose="protocol",
+            temperature=0.2
+        )
+        
+        return {
+            "protocols": [{
+                "protocol": f"Dynamic Protocol: {request.symptom}",
+                "details": content,
+                "contraindications": ["AI Generated - Verify with Medical Control"],
+                "score": 0.8
+            }],
+            "source": "ai_generated"
+        }
     except Exception as e:
         return {
             "protocols": [{
@@ -1112,7 +4582,7 @@ async def search_protocol(request: ProtocolSearchRequest):
 @app.post("/handoff/generate")
 async def generate_handoff(request: HandoffRequest):
     """Generate SBAR handoff summary from transcript history"""
-    session = smart_memory.get_session(request.session_id)
+    session = await smart_memory.aget_session(request.session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
@@ -1126,40 +4596,79 @@ async def generate_handoff(request: HandoffRequest):
 @app.post("/session/{session_id}/add-medication")
 async def add_medication(session_id: str, medication: str):
     """Log administered medication to session"""
-    session = smart_memory.get_session(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    session.administered_medications.append({
+    entry = {
         "medication": medication,
         "timestamp": datetime.utcnow().isoformat()
-    })
+    }
     
-    updated_session = smart_memory.update_session(session)
-    return {"message": "Medication logged", "session": updated_session}
+    updated_session = await smart_memory.mutate_session(
+        session_id,
+        lambda session: session.administered_medications.append(entry)
+    )
+    if not updated_session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    risk_cache.invalidate_session(session_id)
+
+    # Only the new medication is checked; warn the crew as soon as it is logged
+    _, new_warnings = session_interactions.refresh(updated_session)
+    if new_warnings:
+        await manager.send_to_session(session_id, {
+            "type": "interaction_warning",
+            "session_id": session_id,
+            "medication": medication,
+            "warnings": new_warnings
+        })
+    return {"message": "Medication logged", "session": updated_session, "interaction_warnings": new_warnings}
+
+
+@app.get("/session/{session_id}/interactions")
+async def get_session_interactions(session_id: str):
+    """Active drug interaction warnings for a session"""
+    session = await smart_memory.aget_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    warnings, _ = session_interactions.refresh(session)
+    return {"session_id": session_id, "interaction_warnings": warnings}
 
 
 @app.get("/protocols/list")
 async def list_all_protocols():
     """List all available medical protocols"""
+    data_version = reference_data.current
     return {
-        "total": len(MEDICAL_PROTOCOLS_DB),
+        "total": len(data_version.protocols),
+        "version": data_version.versions["protocols"],
         "protocols": [
             {
                 "id": protocol_id,
                 "name": data["protocol"],
                 "keywords": data["keywords"]
             }
-            for protocol_id, data in MEDICAL_PROTOCOLS_DB.items()
+            for protocol_id, data in data_version.protocols.items()
         ]
     }
 
 
+@app.get("/reference-data")
+async def get_reference_data_versions():
+    """Versions of the loaded protocol, drug interaction and hospital data files"""
+    return {"versions": reference_data.current.versions, "loaded_at": reference_data.current.loaded_at}
+
+
+@app.post("/reference-data/reload")
+async def reload_reference_data():
+    """Re-read the data files now instead of waiting for the watcher"""
+    if not await reference_data.reload():
+        raise HTTPException(status_code=422, detail="Reference data failed to load; previous version kept")
+    return {"versions": reference_data.current.versions, "loaded_at": reference_data.current.loaded_at}
+
+
 @app.get("/hospitals")
 async def list_hospitals():
     """List nearby hospitals and their status"""
+    hospitals = reference_data.current.hospitals
     # Simulate dynamic changes
-    for hospital in HOSPITALS_DB:
+    for hospital in hospitals:
         change = random.randint(-2, 2)
         hospital["available_beds"] = max(0, min(hospital["total_beds"], hospital["available_beds"] + change))
         
@@ -1172,7 +4681,7 @@ async def list_hospitals():
         else:
             hospital["status"] = "Normal"
             
-    return {"hospitals": HOSPITALS_DB}
+    return {"hospitals": hospitals}
 
 
 class TriageResult(BaseModel):
@@ -1183,6 +4692,7 @@ class TriageResult(BaseModel):
     recommended_action: str
     ai_rationale: Optional[str] = None
     ai_advice: Optional[str] = None
+    ai_source: Optional[str] = None  # path that produced the rationale: llm, llm_hedged, deadline, fallback, local_only
 
 
 @app.post("/triage/calculate")
@@ -1190,7 +4700,13 @@ async def calculate_triage(request: TriageRequest):
     """
     Calculate ESI Triage Level based on patient inputs.
     Implements standard ESI algorithm logic + AI Rationale.
+    The AI rationale is bounded by the request's `deadline_ms` budget;
+    `ai_source` says whether it came from the LLM, a hedged LLM request,
+    or the local defaults.
     """
+    request_start = time.perf_counter()
+    deadline_ms = request.deadline_ms or TRIAGE_DEADLINE_MS
+
     # 1. Calculate Standard ESI Level (Algorithmic Baseline)
     esi_level = 5
     color = "Blue"
@@ -1233,6 +4749,7 @@ async def calculate_triage(request: TriageRequest):
     # 2. Generate AI Rationale & Advice (Cerebras)
     ai_rationale = "AI analysis unavailable."
     ai_advice = "Follow standard protocols."
+    ai_source = "local_only"
 
     if HAS_CEREBRAS_KEY:
         system_prompt = """You are an expert Triage Nurse. 
@@ -1250,52 +4767,44 @@ async def calculate_triage(request: TriageRequest):
         2. Specific Advice (What to do next?)
         """
         
+        llm_deadline = request_start + deadline_ms * LLM_DEADLINE_FRACTION / 1000
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.post(
-                    CEREBRAS_API_URL,
-                    headers={"Authorization": f"Bearer {CEREBRAS_API_KEY}", "Content-Type": "application/json"},
-                    json={
-                        "model": "llama-3.3-70b",
-                        "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
-                        "temperature": 0.2,
-                        "max_tokens": 100
-                    }
-                )
-                if response.status_code == 200:
-                    content = response.json()["choices"][0]["message"]["content"]
-                    parts = content.split("|")
-                    if len(parts) == 2:
-                        ai_rationale = parts[0].strip()
-                        ai_advice = parts[1].strip()
-                    else:
-                        ai_rationale = content
-                        ai_advice = "Monitor patient closely."
+            content, ai_source = await call_cerebras_within(
+                [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
+                purpose="triage",
+                timeout=llm_deadline - time.perf_counter(),
+                temperature=0.2,
+                max_tokens=100
+            )
+            parts = content.split("|")
+            if len(parts) == 2:
+                ai_rationale = parts[0].strip()
+                ai_advice = parts[1].strip()
+            else:
+                ai_rationale = content
+                ai_advice = "Monitor patient closely."
+        except asyncio.TimeoutError:
+            ai_rationale = f"AI analysis did not finish within {deadline_ms:.0f}ms budget."
+            ai_source = "deadline"
         except Exception as e:
             print(f"Triage AI Error: {e}")
-
-    return TriageResult(
-        esi_level=esi_level,
-        color=color,
-        description=description,
-        recommended_action=recommended_action,
-        ai_rationale=ai_rationale,
-        ai_advice=ai_advice
-    )
+            ai_source = "fallback"
 
     # Save to session if session_id provided
     if request.session_id:
-        session = smart_memory.get_session(request.session_id)
-        if session:
-            session.triage_result = {
-                "esi_level": esi_level,
-                "description": description,
-                "symptoms": request.symptoms,
-                "ai_rationale": ai_rationale,
-                "ai_advice": ai_advice,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-            smart_memory.update_session(session)
+        triage_record = {
+            "esi_level": esi_level,
+            "description": description,
+            "symptoms": request.symptoms,
+            "ai_rationale": ai_rationale,
+            "ai_advice": ai_advice,
+            "ai_source": ai_source,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        await smart_memory.mutate_session(
+            request.session_id,
+            lambda session: setattr(session, "triage_result", triage_record)
+        )
 
     return TriageResult(
         esi_level=esi_level,
@@ -1303,7 +4812,8 @@ async def calculate_triage(request: TriageRequest):
         description=description,
         recommended_action=recommended_action,
         ai_rationale=ai_rationale,
-        ai_advice=ai_advice
+        ai_advice=ai_advice,
+        ai_source=ai_source
     )
 
 
@@ -1333,6 +4843,43 @@ async def speak_text(request: SpeakRequest):
     }
 
 
+@app.post("/speak/stream")
+async def speak_text_stream(request: SpeakRequest):
+    """Stream speech for the text as audio/mpeg while it is being synthesized"""
+    if not request.text:
+        raise HTTPException(status_code=400, detail="Text is required")
+    return await audio_stream_response(request.text)
+
+
+@app.post("/audio")
+async def register_audio(request: SpeakRequest):
+    """Register text to speak and get a URL that streams it (usable as an <audio> src)"""
+    if not request.text:
+        raise HTTPException(status_code=400, detail="Text is required")
+    if not HAS_ELEVENLABS_KEY:
+        raise HTTPException(status_code=503, detail="ElevenLabs API key not configured")
+    handle = audio_handles.register(request.text)
+    return {"handle": handle, "audio_url": f"/audio/{handle}"}
+
+
+@app.get("/audio/jobs/{job_id}")
+async def get_audio_job(job_id: str):
+    """Status of a background audio synthesis job"""
+    job = audio_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Audio job not found")
+    return job.to_dict()
+
+
+@app.get("/audio/{handle}")
+async def stream_audio(handle: str):
+    """Stream the audio registered under a handle"""
+    text = audio_handles.text_for(handle)
+    if text is None:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    return await audio_stream_response(text)
+
+
 
 # ============================================================================
 # NEW ENDPOINTS FOR COMMAND CENTER
@@ -1344,14 +4891,7 @@ async def speak_text(request: SpeakRequest):
 
 async def simulate_vitals_task(session_id: str):
     """Background task to simulate changing vitals"""
-    session = smart_memory.get_session(session_id)
-    if not session:
-        return
-
-    # Run for 5 minutes (150 * 2 seconds)
-    for _ in range(150):
-        await asyncio.sleep(2)
-        
+    def fluctuate_vitals(session: SessionContext) -> None:
         # Randomly fluctuate vitals
         current_pulse = session.patient_vitals.pulse or 80
         current_spo2 = session.patient_vitals.spo2 or 98
@@ -1365,8 +4905,16 @@ async def simulate_vitals_task(session_id: str):
         session.patient_vitals.spo2 = new_spo2
         session.patient_vitals.blood_pressure = f"{new_sys}/80"
         session.patient_vitals.respiratory_rate = random.randint(12, 20)
+
+    # Run for 5 minutes (150 * 2 seconds)
+    for _ in range(150):
+        await asyncio.sleep(2)
         
-        smart_memory.update_session(session)
+        # Re-read the session every tick so concurrent medication logs are kept
+        updated_session = await smart_memory.mutate_session(session_id, fluctuate_vitals)
+        if not updated_session:
+            return
+        vitals_stream.publish(session_id, updated_session.patient_vitals)
 
 @app.post("/session/{session_id}/simulate")
 async def start_simulation(session_id: str, background_tasks: BackgroundTasks):
@@ -1425,6 +4973,240 @@ async def websocket_endpoint(websocket: WebSocket, unit_id: str):
                 "units": manager.unit_locations
             })
 
+
+@app.websocket("/ws/vitals/{session_id}")
+async def vitals_websocket(websocket: WebSocket, session_id: str):
+    """Vitals push for one session: a `vitals_snapshot`, then `vitals_delta` messages with changed fields"""
+    await websocket.accept()
+    session = await smart_memory.aget_session(session_id)
+    if not session:
+        await websocket.close(code=4404, reason="Session not found")
+        return
+    queue = vitals_stream.subscribe(session_id, session.patient_vitals)
+
+    async def watch_disconnect() -> None:
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    receiver = asyncio.create_task(watch_disconnect())
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                getter.cancel()
+                break
+            await websocket.send_text(getter.result())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        vitals_stream.unsubscribe(session_id, queue)
+
+
+@app.websocket("/ws/session/{session_id}")
+async def session_websocket(websocket: WebSocket, session_id: str):
+    """Push channel for one session (e.g. `audio_ready` when an alert is synthesized)"""
+    await manager.connect_session(session_id, websocket)
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        manager.disconnect_session(session_id, websocket)
+
+class TranscriptStream:
+    """
+    Incremental analysis state for one /ws/analyze connection
+
+    Fragments are appended to the unfinished sentence. Each fragment is
+    checked against only the text it added: risk keywords (the detector
+    scans the unfinished sentence so negation cues in earlier fragments
+    still apply, but only matches ending in the new text are reported) and
+    drug names mentioned against the session's medications. Finished
+    sentences move into a sliding window of TRANSCRIPT_WINDOW_SENTENCES,
+    which is what the full risk pipeline (and the LLM) sees.
+    """
+
+    _SENTENCE_END = re.compile(r"[.!?]+(?=\s|$)")
+
+    def __init__(self, session: SessionContext):
+        self.session = session
+        self.window: deque = deque(maxlen=TRANSCRIPT_WINDOW_SENTENCES)
+        self.pending = ""
+        self.reported_pairs: Set[Tuple[str, str]] = set()
+        self.last_verdict: Optional[Tuple[str, Optional[str]]] = None
+
+    def add_fragment(self, text: str) -> List[Dict[str, Any]]:
+        """Append a fragment; returns the push messages for anything found in it"""
+        scanned = len(self.pending)
+        self.pending = f"{self.pending} {text}" if self.pending else text
+        messages: List[Dict[str, Any]] = []
+
+        risks = [
+            risk for risk in risk_detector.detect(self.pending)
+            if risk["end"] > scanned and not risk["negated"]
+        ]
+        if risks:
+            messages.append({"type": "risk_keywords", "text": text, "risks": risks})
+
+        normalizer = reference_data.current.interaction_graph.normalizer
+        mentioned = list(dict.fromkeys(name for name, _, end in normalizer.mentions(self.pending) if end > scanned))
+        if mentioned:
+            session_medications = list(self.session.patient_history.current_medications) + list(self.session.administered_medications)
+            warnings = [
+                warning for warning in reference_data.current.interaction_graph.interactions_between(mentioned, session_medications)
+                if (warning["drug1"], warning["drug2"]) not in self.reported_pairs
+            ]
+            if warnings:
+                self.reported_pairs.update((warning["drug1"], warning["drug2"]) for warning in warnings)
+                messages.append({
+                    "type": "interaction_warning",
+                    "session_id": self.session.session_id,
+                    "medication": ", ".join(mentioned),
+                    "warnings": warnings
+                })
+        return messages
+
+    def complete_sentences(self, force: bool = False) -> Optional[str]:
+        """
+        Move finished sentences (all pending text when `force`, or when it
+        has grown past TRANSCRIPT_MAX_PENDING_CHARS) into the window;
+        returns the moved text or None if nothing finished
+        """
+        if force or len(self.pending) > TRANSCRIPT_MAX_PENDING_CHARS:
+            cut = len(self.pending)
+        else:
+            boundaries = list(self._SENTENCE_END.finditer(self.pending))
+            if not boundaries:
+                return None
+            cut = boundaries[-1].end()
+        finished, self.pending = self.pending[:cut].strip(), self.pending[cut:].strip()
+        if not finished:
+            return None
+        self.window.append(finished)
+        return finished
+
+    def window_text(self) -> str:
+        return " ".join(self.window)
+
+
+@app.websocket("/ws/analyze/{session_id}")
+async def analyze_websocket(websocket: WebSocket, session_id: str):
+    """
+    Streaming transcript analysis for one session
+
+    The client sends fragments as `{"text": ..., "final": false}` (or plain
+    text). Keyword and drug interaction findings in the new text are pushed
+    at once (`risk_keywords`, `interaction_warning`). At a sentence boundary,
+    on `"final": true`, or after TRANSCRIPT_DEBOUNCE_SECONDS without input,
+    the sliding window goes through the risk pipeline and a changed verdict
+    is pushed as `risk_analysis`; a new warning is logged and spoken as on
+    /analyze. Only one pipeline run is in flight per stream, and boundaries
+    reached meanwhile are folded into the next run.
+    """
+    await websocket.accept()
+    session = await smart_memory.aget_session(session_id)
+    if not session:
+        await websocket.close(code=4404, reason="Session not found")
+        return
+
+    stream = TranscriptStream(session)
+    analysis_task: Optional[asyncio.Task] = None
+    rerun = False
+
+    async def analyze_window() -> None:
+        nonlocal rerun
+        while True:
+            rerun = False
+            start = time.perf_counter()
+            latest = await smart_memory.aget_session(session_id)
+            if latest is not None:
+                stream.session = latest
+            window = stream.window_text()
+            timings: Dict[str, Optional[float]] = {"local_checks": None, "llm": None}
+            # Interactions are pushed per fragment, so the window is judged on its own content
+            analysis = await analyze_medical_risk(
+                transcript=window,
+                patient_history=stream.session.patient_history,
+                administered_medications=stream.session.administered_medications,
+                timings=timings,
+                drug_warnings=[],
+                session_id=session_id,
+                llm_deadline=start + ANALYZE_DEADLINE_MS * LLM_DEADLINE_FRACTION / 1000
+            )
+            verdict = (analysis["status"], analysis.get("reason"))
+            if verdict != stream.last_verdict:
+                stream.last_verdict = verdict
+                audio_job = None
+                if analysis["status"] == "WARNING":
+                    audio_job = await issue_risk_warning(session_id, analysis["reason"])
+                await websocket.send_json({
+                    "type": "risk_analysis",
+                    "session_id": session_id,
+                    "window": window,
+                    "analysis": analysis,
+                    "audio_job": audio_job,
+                    "timings_ms": {**timings, "total": (time.perf_counter() - start) * 1000}
+                })
+            if not rerun:
+                return
+
+    def schedule_analysis() -> None:
+        nonlocal analysis_task, rerun
+        if analysis_task is not None and not analysis_task.done():
+            rerun = True
+            return
+        analysis_task = asyncio.create_task(analyze_window())
+
+    metrics.incr("ws_analyze.connections")
+    try:
+        while True:
+            try:
+                if stream.pending:
+                    message = await asyncio.wait_for(websocket.receive_text(), TRANSCRIPT_DEBOUNCE_SECONDS)
+                else:
+                    message = await websocket.receive_text()
+            except asyncio.TimeoutError:
+                # Speaker paused mid-sentence: analyze what we have
+                if stream.complete_sentences(force=True):
+                    schedule_analysis()
+                continue
+
+            try:
+                data = json.loads(message)
+            except json.JSONDecodeError:
+                data = {"text": message}
+            if not isinstance(data, dict):
+                data = {"text": str(data)}
+            text = str(data.get("text") or "").strip()
+            if text:
+                metrics.incr("ws_analyze.fragments")
+                with metrics.timer("ws_analyze.incremental_ms"):
+                    pushes = stream.add_fragment(text)
+                for push in pushes:
+                    await websocket.send_json(push)
+            if stream.complete_sentences(force=bool(data.get("final"))):
+                schedule_analysis()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if analysis_task is not None:
+            analysis_task.cancel()
+
+
 if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate-sqlite":
+        # python server.py migrate-sqlite [json_path] [db_path]
+        json_path = sys.argv[2] if len(sys.argv) > 2 else SMART_MEMORY_JSON_PATH
+        db_path = sys.argv[3] if len(sys.argv) > 3 else SMART_MEMORY_SQLITE_PATH
+        migrated = migrate_json_to_sqlite(json_path, db_path)
+        print(f"Migrated {migrated} sessions from {json_path} to {db_path}")
+        sys.exit(0)
+
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+
+# server.py opens its stores and caches at import time; keep them out of the tree
+_STATE_DIR = tempfile.mkdtemp(prefix="resq-tests-")
+for name, path in {
+    "SMART_MEMORY_JSON_PATH": "smart_memory_sessions.json",
+    "SMART_MEMORY_LOG_DIR": "smart_memory",
+    "SMART_MEMORY_SQLITE_PATH": "smart_memory.db",
+    "TTS_CACHE_DIR": "tts_cache",
+    "PROTOCOL_EMBEDDING_DIR": "protocol_embeddings",
+    "REFERENCE_INDEX_DIR": "reference_indexes",
+}.items():
+    os.environ.setdefault(name, os.path.join(_STATE_DIR, path))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from server import (
+    NUMPY_AVAILABLE,
+    PROTOCOL_SEARCH_BACKEND,
+    HybridProtocolSearch,
+    InMemoryProtocolSearch,
+    VectorProtocolSearch,
+    reference_data,
+)
+
+OFF_TOPIC = ["toothache", "sprained ankle", "fell off ladder"]
+
+
+def search(backend, query):
+    return asyncio.run(backend.search_protocol(query))
+
+
+def test_keyword_search_is_the_default():
+    assert PROTOCOL_SEARCH_BACKEND == "keyword"
+
+
+@pytest.fixture(
+    params=[
+        "keyword",
+        pytest.param("vector", marks=pytest.mark.skipif(not NUMPY_AVAILABLE, reason="numpy not installed")),
+        pytest.param("hybrid", marks=pytest.mark.skipif(not NUMPY_AVAILABLE, reason="numpy not installed")),
+    ]
+)
+def backend(request):
+    protocols = reference_data.current.protocols
+    if request.param == "keyword":
+        return InMemoryProtocolSearch(protocols, index_dir=None)
+    if request.param == "vector":
+        return VectorProtocolSearch(protocols, cache_dir=None)
+    return HybridProtocolSearch(protocols, cache_dir=None)
+
+
+@pytest.mark.parametrize("query", OFF_TOPIC)
+def test_off_topic_queries_fall_back_to_general_assessment(backend, query):
+    general = reference_data.current.protocols["general_assessment"]["protocol"]
+    assert [result["protocol"] for result in search(backend, query)] == [general]
+
+
+def test_on_topic_query_finds_its_protocol(backend):
+    assert search(backend, "chest pains")[0]["protocol"] == reference_data.current.protocols["chest_pain"]["protocol"]
@@ -0,0 +1,33 @@
+import pytest
+
+from server import RISK_CACHE_NEAR_DUPLICATE_THRESHOLD, RiskAnalysisCache
+
+CONTEXT = "context"
+VERDICT = {"status": "SAFE", "reason": None}
+
+
+def test_near_duplicates_are_off_by_default():
+    assert RISK_CACHE_NEAR_DUPLICATE_THRESHOLD == 0
+    cache = RiskAnalysisCache(16, 60.0, RISK_CACHE_NEAR_DUPLICATE_THRESHOLD)
+    cache.put("Giving morphine 4 mg IV now", CONTEXT, VERDICT)
+    assert cache.get("giving morphine 4mg IV now!", CONTEXT)["cache"] == "exact"
+    assert cache.get("Giving morphine 4 mg IV now please", CONTEXT) is None
+
+
+@pytest.mark.parametrize(
+    "cached,asked",
+    [
+        ("Giving morphine 4 mg IV now", "Giving morphine 40 mg IV now"),
+        ("We are going to give aspirin now", "We are not going to give aspirin now"),
+    ]
+)
+def test_near_duplicates_must_agree_on_numbers_and_negations(cached, asked):
+    cache = RiskAnalysisCache(16, 60.0, 0.5)
+    cache.put(cached, CONTEXT, VERDICT)
+    assert cache.get(asked, CONTEXT) is None
+
+
+def test_near_duplicate_with_same_numbers_is_reused():
+    cache = RiskAnalysisCache(16, 60.0, 0.5)
+    cache.put("Giving morphine 4 mg IV now", CONTEXT, VERDICT)
+    assert cache.get("Okay giving morphine 4 mg IV now", CONTEXT)["cache"] == "near_duplicate"
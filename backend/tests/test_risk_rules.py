@@ -0,0 +1,73 @@
+import pytest
+
+from server import RISK_LLM_CONFIDENCE_THRESHOLD, PatientHistory, classify_risk_locally, risk_detector
+
+
+def negations(text):
+    return {risk["keyword"]: risk["negated"] for risk in risk_detector.detect(text)}
+
+
+@pytest.mark.parametrize(
+    "text,keyword",
+    [
+        ("No improvement, bleeding heavily now", "bleeding"),
+        ("Not responding, unconscious", "unconscious"),
+        ("There is no way to stop the bleeding", "bleeding"),
+        ("No bleeding earlier but now unconscious", "unconscious"),
+        ("Not bleeding at first, still bleeding now", "bleeding"),
+        ("No chest pain and bleeding heavily", "bleeding"),
+        ("No shock and seizure now", "seizure"),
+    ]
+)
+def test_negation_does_not_cross_clauses_or_reach_ungoverned_terms(text, keyword):
+    assert negations(text)[keyword] is False
+
+
+@pytest.mark.parametrize(
+    "text,keyword",
+    [
+        ("No chest pain", "chest pain"),
+        ("Patient denies bleeding", "bleeding"),
+        ("CT negative for stroke", "stroke"),
+        ("No signs of bleeding", "bleeding"),
+        ("Denies chest pain or difficulty breathing", "difficulty breathing"),
+    ]
+)
+def test_negation_cue_governs_the_next_term(text, keyword):
+    assert negations(text)[keyword] is True
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Patient is no longer stable",
+        "Not yet stable, getting worse",
+        "He was stable, now crashing and gray",
+        "No improvement, still bleeding heavily, vitals otherwise stable",
+        "No bleeding, resting comfortably",
+    ]
+)
+def test_qualified_benign_cues_are_never_confidently_safe(text):
+    result = classify_risk_locally(text)
+    assert result["status"] == "WARNING" or result["confidence"] < RISK_LLM_CONFIDENCE_THRESHOLD
+
+
+def test_routine_transcript_is_confidently_safe():
+    result = classify_risk_locally("Patient resting comfortably, alert and oriented")
+    assert result["status"] == "SAFE"
+    assert result["confidence"] >= RISK_LLM_CONFIDENCE_THRESHOLD
+
+
+@pytest.mark.parametrize(
+    "text,history",
+    [
+        ("Patient stable, administering penicillin IV", PatientHistory(allergies=["penicillin"])),
+        ("Patient stable, history of asthma noted", PatientHistory(medical_conditions=["asthma"])),
+        ("Patient stable, giving the nebulizer", PatientHistory(current_medications=["Warfarin"])),
+    ]
+)
+def test_patient_history_keeps_safe_below_the_threshold(text, history):
+    assert classify_risk_locally(text)["confidence"] >= RISK_LLM_CONFIDENCE_THRESHOLD
+    result = classify_risk_locally(text, history)
+    assert result["status"] == "SAFE"
+    assert result["confidence"] < RISK_LLM_CONFIDENCE_THRESHOLD
@@ -0,0 +1,53 @@
+import asyncio
+
+from server import SingleFlight
+
+
+def test_work_is_cancelled_when_the_last_waiter_leaves():
+    async def run():
+        flight = SingleFlight("test.single_flight.abandon")
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def work():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await started.wait()
+
+        first.cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled.is_set()
+
+        second.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert flight._in_flight == {}
+        assert flight._waiters == {}
+
+    asyncio.run(run())
+
+
+def test_remaining_waiter_still_gets_the_result():
+    async def run():
+        flight = SingleFlight("test.single_flight.share")
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "answer"
+
+        leaving = asyncio.ensure_future(flight.do("key", work))
+        staying = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        release.set()
+        assert await staying == "answer"
+        assert flight.coalesced == 1
+
+    asyncio.run(run())
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from server import AppendOnlyLogSessionStore, SmartMemoryManager, SqliteSessionStore
+
+SESSIONS = 4
+MUTATIONS_PER_SESSION = 100
+
+
+def make_store(backend, tmp_path):
+    if backend == "sqlite":
+        return SqliteSessionStore(str(tmp_path / "smart_memory.db"))
+    return AppendOnlyLogSessionStore(str(tmp_path / "smart_memory"), compact_every=50)
+
+
+@pytest.mark.parametrize(
+    "backend,flush_interval",
+    [("log", 0.01), ("sqlite", 0.01), ("log", 0), ("sqlite", 0)],
+    ids=["log-write-behind", "sqlite-write-behind", "log-write-through", "sqlite-write-through"]
+)
+def test_concurrent_mutations_lose_no_updates(backend, flush_interval, tmp_path):
+    session_ids = [f"stress-{index}" for index in range(SESSIONS)]
+
+    async def run():
+        # A cache smaller than the working set pushes dirty sessions through the pending path
+        manager = SmartMemoryManager(
+            store=make_store(backend, tmp_path),
+            cache_size=2,
+            flush_interval=flush_interval,
+            io_workers=4
+        )
+        manager.start()
+        created = {session_id: await manager.acreate_session(session_id) for session_id in session_ids}
+
+        def add_medication(name):
+            return lambda session: session.administered_medications.append(name)
+
+        await asyncio.gather(*(
+            manager.mutate_session(session_id, add_medication(f"{session_id}-med-{index}"))
+            for index in range(MUTATIONS_PER_SESSION)
+            for session_id in session_ids
+        ))
+        await manager.stop()
+        manager.store.close()
+        return created
+
+    created = asyncio.run(run())
+
+    # Read back through a fresh store so only what reached disk counts
+    store = make_store(backend, tmp_path)
+    try:
+        for session_id in session_ids:
+            data = store.load(session_id)
+            expected = {f"{session_id}-med-{index}" for index in range(MUTATIONS_PER_SESSION)}
+            assert len(data["administered_medications"]) == MUTATIONS_PER_SESSION
+            assert set(data["administered_medications"]) == expected
+            assert data["version"] == created[session_id].version + MUTATIONS_PER_SESSION
+    finally:
+        store.close()
+
+
+class FlakySqliteStore(SqliteSessionStore):
+    """Fails the first save it sees"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failures_left = 1
+
+    def save(self, session_id, data):
+        if self.failures_left:
+            self.failures_left -= 1
+            raise OSError("disk full")
+        super().save(session_id, data)
+
+
+def test_failed_flush_keeps_unsaved_sessions_dirty(tmp_path):
+    manager = SmartMemoryManager(store=FlakySqliteStore(str(tmp_path / "smart_memory.db")), flush_interval=60)
+    for session_id in ("a", "b", "c"):
+        manager.create_session(session_id)
+
+    with pytest.raises(OSError):
+        manager.flush()
+    assert manager.flush() == 1
+
+    for session_id in ("a", "b", "c"):
+        assert manager.store.load(session_id) is not None
+    manager.close()
+
+
+def test_sqlite_vitals_history_records_each_saved_change(tmp_path):
+    manager = SmartMemoryManager(store=SqliteSessionStore(str(tmp_path / "smart_memory.db")), flush_interval=0)
+    session = manager.create_session("vitals")
+    for pulse in (80, 95, 110):
+        session.patient_vitals.pulse = pulse
+        session = manager.update_session(session)
+
+    history = manager.vitals_history("vitals")
+    assert [reading["pulse"] for reading in history][-3:] == [80, 95, 110]
+    assert [reading["pulse"] for reading in manager.vitals_history("vitals", limit=2)] == [95, 110]
+    manager.close()
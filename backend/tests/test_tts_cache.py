@@ -0,0 +1,21 @@
+import asyncio
+import os
+
+from server import TTSAudioCache
+
+
+def test_concurrent_puts_keep_the_disk_index_consistent(tmp_path):
+    clip = b"x" * 1000
+
+    async def run():
+        cache = TTSAudioCache(str(tmp_path), memory_max_bytes=0, disk_max_bytes=10 * len(clip))
+        await asyncio.gather(*(cache.put(f"clip-{index}", clip) for index in range(50)))
+        return cache
+
+    cache = asyncio.run(run())
+
+    on_disk = {name[:-4]: os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path)}
+    assert on_disk == dict(cache._disk)
+    assert cache._disk_bytes == sum(on_disk.values()) == 10 * len(clip)
+    # The most recent puts survive eviction
+    assert set(on_disk) == {f"clip-{index}" for index in range(40, 50)}
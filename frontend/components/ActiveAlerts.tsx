@@ -12,7 +12,7 @@ export default function ActiveAlerts() {
 
     const playAlert = async (text: string) => {
         try {
-            const res = await fetch("http://localhost:8000/speak", {
+            const res = await fetch("http://localhost:8000/audio", {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
                 body: JSON.stringify({ text }),
@@ -21,8 +21,8 @@ export default function ActiveAlerts() {
             if (!res.ok) throw new Error("Failed to generate audio");
 
             const data = await res.json();
-            if (data.audio_base64) {
-                const audio = new Audio(`data:audio/mp3;base64,${data.audio_base64}`);
+            if (data.audio_url) {
+                const audio = new Audio(`http://localhost:8000${data.audio_url}`);
                 audio.play();
             }
         } catch (error) {
@@ -80,6 +80,8 @@ export default function EmergencyDashboard() {
   const audioChunksRef = useRef<Blob[]>([]);
   const transcriptEndRef = useRef<HTMLDivElement>(null);
   const alertAudioRef = useRef<HTMLAudioElement | null>(null);
+  // Audio jobs already playing from /analyze's streaming URL
+  const playedAudioJobsRef = useRef<Set<string>>(new Set());
   const speechRecognitionRef = useRef<SpeechRecognitionInstance | null>(null);
   const isRecordingRef = useRef(false);
   const transcriptHandlerRef = useRef<(text: string) => void>(() => {});
@@ -170,6 +172,33 @@ export default function EmergencyDashboard() {
     initializeSession(sessionId);
   }, [sessionId]);
 
+  // Session push channel: spoken alerts arrive here once synthesized
+  // (unless this dashboard is already streaming them), drug interactions
+  // as soon as a medication is logged
+  useEffect(() => {
+    if (!sessionId) return;
+    const ws = new WebSocket(`${BACKEND_URL.replace(/^http/, 'ws')}/ws/session/${sessionId}`);
+    ws.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      if (message.type === 'audio_ready' && message.audio_url) {
+        if (!playedAudioJobsRef.current.delete(message.job_id)) {
+          playAudioAlert(`${BACKEND_URL}${message.audio_url}`);
+        }
+      } else if (message.type === 'interaction_warning') {
+        for (const warning of message.warnings) {
+          const text = `${warning.risk} - ${warning.drug1} + ${warning.drug2}: ${warning.recommendation}`;
+          setCurrentAlert({
+            severity: warning.severity === 'CRITICAL' ? 'critical' : 'warning',
+            message: text,
+            timestamp: new Date().toISOString(),
+          });
+          addTranscriptEntry('system', `⚠️ INTERACTION: ${text}`);
+        }
+      }
+    };
+    return () => ws.close();
+  }, [sessionId]);
+
   useEffect(() => {
     isRecordingRef.current = isRecording;
   }, [isRecording]);
@@ -386,9 +415,12 @@ export default function EmergencyDashboard() {
         setCurrentAlert(alert);
         addTranscriptEntry('system', `⚠️ ALERT: ${data.analysis.reason}`);
         
-        // Play audio alert if available
-        if (data.audio_alert) {
-          playAudioAlert(data.audio_alert);
+        // The audio URL streams the alert while it is still being synthesized
+        if (data.audio_url) {
+          if (data.audio_job) {
+            playedAudioJobsRef.current.add(data.audio_job.job_id);
+          }
+          playAudioAlert(`${BACKEND_URL}${data.audio_url}`);
         }
         
         // Clear alert after 10 seconds
@@ -490,29 +522,14 @@ export default function EmergencyDashboard() {
   // ============================================================================
   // AUDIO ALERT PLAYBACK
   // ============================================================================
-  const playAudioAlert = (base64Audio: string) => {
+  const playAudioAlert = (audioUrl: string) => {
     try {
       if (!alertAudioRef.current) return;
       
-      // Convert base64 to blob
-      const byteCharacters = atob(base64Audio);
-      const byteNumbers = new Array(byteCharacters.length);
-      for (let i = 0; i < byteCharacters.length; i++) {
-        byteNumbers[i] = byteCharacters.charCodeAt(i);
-      }
-      const byteArray = new Uint8Array(byteNumbers);
-      const blob = new Blob([byteArray], { type: 'audio/mpeg' });
-      
-      // Create object URL and play
-      const audioUrl = URL.createObjectURL(blob);
+      // Uncached clips are streamed, so playback starts before synthesis finishes
       alertAudioRef.current.src = audioUrl;
       alertAudioRef.current.play();
       
-      // Cleanup
-      alertAudioRef.current.onended = () => {
-        URL.revokeObjectURL(audioUrl);
-      };
-      
     } catch (error) {
       console.error('Audio playback error:', error);
     }
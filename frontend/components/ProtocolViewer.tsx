@@ -77,14 +77,14 @@ export default function ProtocolViewer() {
                                     onClick={async () => {
                                         try {
                                             const text = `Protocol for ${p.protocol}. ${p.details}`;
-                                            const res = await fetch("http://localhost:8000/speak", {
+                                            const res = await fetch("http://localhost:8000/audio", {
                                                 method: "POST",
                                                 headers: { "Content-Type": "application/json" },
                                                 body: JSON.stringify({ text }),
                                             });
                                             const data = await res.json();
-                                            if (data.audio_base64) {
-                                                new Audio(`data:audio/mp3;base64,${data.audio_base64}`).play();
+                                            if (data.audio_url) {
+                                                new Audio(`http://localhost:8000${data.audio_url}`).play();
                                             }
                                         } catch (e) {
                                             console.error(e);
@@ -48,9 +48,9 @@ export default function RiskAnalysisFeed({ sessionId }: { sessionId: string }) {
                 source: result.source
             }]);
 
-            if (data.audio_alert) {
-                const audio = new Audio(`data:audio/mp3;base64,${data.audio_alert}`);
-                audio.play();
+            // Streams while the background job is still synthesizing it
+            if (data.audio_url) {
+                new Audio(`http://localhost:8000${data.audio_url}`).play();
             }
 
             setTranscript("");
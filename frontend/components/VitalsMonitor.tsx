@@ -13,25 +13,35 @@ export default function VitalsMonitor({ pulse: initialPulse, spo2: initialSpo2,
     const [pulse, setPulse] = useState<number | null>(initialPulse || 80);
     const [spo2, setSpo2] = useState<number | null>(initialSpo2 || 98);
 
-    // Poll for vitals if sessionId is provided
+    // Vitals are pushed by the backend: a snapshot on connect, then only changed fields
     useEffect(() => {
         if (!sessionId) return;
 
-        const fetchVitals = async () => {
-            try {
-                const res = await fetch(`http://localhost:8000/session/${sessionId}`);
-                const data = await res.json();
-                if (data.patient_vitals) {
-                    if (data.patient_vitals.pulse) setPulse(data.patient_vitals.pulse);
-                    if (data.patient_vitals.spo2) setSpo2(data.patient_vitals.spo2);
-                }
-            } catch (e) {
-                console.error("Failed to fetch vitals", e);
-            }
+        let ws: WebSocket | null = null;
+        let retry: ReturnType<typeof setTimeout> | null = null;
+        let closed = false;
+
+        const connect = () => {
+            ws = new WebSocket(`ws://localhost:8000/ws/vitals/${sessionId}`);
+            ws.onmessage = (event) => {
+                const message = JSON.parse(event.data);
+                if (message.type !== "vitals_snapshot" && message.type !== "vitals_delta") return;
+                const vitals = message.vitals;
+                if (vitals.pulse) setPulse(vitals.pulse);
+                if (vitals.spo2) setSpo2(vitals.spo2);
+            };
+            ws.onclose = () => {
+                if (!closed) retry = setTimeout(connect, 2000);
+            };
+            ws.onerror = (e) => console.error("Vitals stream error", e);
         };
 
-        const interval = setInterval(fetchVitals, 2000);
-        return () => clearInterval(interval);
+        connect();
+        return () => {
+            closed = true;
+            if (retry) clearTimeout(retry);
+            ws?.close();
+        };
     }, [sessionId]);
 
     const startSimulation = async () => {
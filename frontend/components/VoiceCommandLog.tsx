@@ -94,7 +94,7 @@ export default function VoiceCommandLog() {
         if (language === 'urdu') {
             try {
                 setIsSpeaking(true);
-                const res = await fetch("http://localhost:8000/speak", {
+                const res = await fetch("http://localhost:8000/audio", {
                     method: "POST",
                     headers: { "Content-Type": "application/json" },
                     body: JSON.stringify({ text }),
@@ -103,8 +103,8 @@ export default function VoiceCommandLog() {
                 if (!res.ok) throw new Error("TTS request failed");
 
                 const data = await res.json();
-                if (data.audio_base64) {
-                    const audio = new Audio(`data:audio/mp3;base64,${data.audio_base64}`);
+                if (data.audio_url) {
+                    const audio = new Audio(`http://localhost:8000${data.audio_url}`);
                     audio.onended = () => setIsSpeaking(false);
                     audio.play();
                     return;